@@ -0,0 +1,646 @@
+import time
+from copy import deepcopy
+import heapq
+import tracemalloc
+import importlib.util
+import os
+from Structures import *
+from NetworkBuilder import randomEmptyNetwork
+from SpawnSchedule import SpawnSchedule
+from FailureMonitor import FailureMonitor
+from Profiler import TickProfiler
+from TraceRecorder import TraceRecorder, Trace
+from Replay import Replay
+from Queueing import queueingEstimate, screen
+
+
+def stripeNetwork(nbStations, nbLines, graphModel='compact', seed=0):
+
+    '''Builds a random network where nbLines vertical lines and nbLines horizontal lines each serve a stripe of the map, so that every station is on two lines.'''
+
+    rnd.seed(seed)
+    network = randomEmptyNetwork(3, nbStations)
+    network.graphModel = graphModel
+
+    for axis in (0, 1):
+        order = sorted(range(nbStations), key=lambda i: network.stations[i].loc[axis])
+        for k in range(nbLines):
+            stripe = order[k * nbStations // nbLines:(k + 1) * nbStations // nbLines]
+            route = sorted(stripe, key=lambda i: network.stations[i].loc[1 - axis])
+            nb = len(network.lines)
+            network.lines.append(Line(nb, route, [Train(nb, 0, 0, [], 6)], cyclic=False))
+
+    network.updateAllPaths()
+    return network
+
+
+def chrono(f, *args):
+    start = time.perf_counter()
+    f(*args)
+    return time.perf_counter() - start
+
+
+def benchmarkCCH(sizes=(100, 300, 1000), graphModel='compact', sample=10):
+
+    '''Compares the contraction hierarchy with computepaths on stripe networks. computepaths is timed on sample stations and scaled to all of them. A train is then added to a line, which only changes weights, and the hierarchy is customized again.'''
+
+    results = []
+
+    for n in sizes:
+        network = stripeNetwork(n, max(2, int(np.sqrt(n) / 2)), graphModel)
+        stations = network.stations[:: max(1, n // sample)]
+        perStation = chrono(lambda: [computepaths(station, network) for station in stations]) / len(stations)
+
+        network.backend = 'python'
+        searches = chrono(network.updateAllPaths)
+        reference = [list(station.durations) for station in network.stations]
+
+        network.backend = 'cch'
+        network.hierarchy = None
+        preprocessing = chrono(lambda: CCH(network.graph))
+        network.updateAllPaths()
+        error = max([abs(a - b) for (station, d) in zip(network.stations, reference) for (a, b) in zip(station.durations, d) if b < float('inf')] + [0])
+
+        network.addTrain(Train(0, 0, 0, [], 6))
+        network.graph = network.createGraph()
+        customization = chrono(network.hierarchy.customize, network.graph.weights)
+        queries = chrono(lambda: [network.hierarchy.shapeTree(network.graph, shapeTargets(network, i)) for i in range(len(network.shapes))])
+
+        result = {'stations': n, 'vertices': len(network.graph), 'edges': network.graph.edgeNumber(), 'shortcuts': len(network.hierarchy.low), 'computepaths': perStation * n, 'shapeSearches': searches, 'preprocessing': preprocessing, 'customization': customization, 'queries': queries, 'error': error}
+        results.append(result)
+        print(result)
+
+    return results
+
+
+class RoutePassenger:
+
+    '''A passenger as they used to be: an object with a __dict__ holding a copy of its route.'''
+
+    def __init__(self, shape, shapeNb, route):
+        self.shape = shape
+        self.shapeNb = shapeNb
+        self.route = route
+
+
+def benchmarkPassengers(nbPassengers=100000, nbStations=300, seed=0):
+
+    '''Measures the memory taken by nbPassengers passengers spawned at random stations, when they hold a cursor in the PathTable of the network and when each one holds a copy of its route, as they used to.'''
+
+    network = stripeNetwork(nbStations, max(2, int(np.sqrt(nbStations) / 2)), seed=seed)
+    spawns = [(rnd.choice(network.stations), rnd.randrange(len(network.shapes))) for _ in range(nbPassengers)]
+    results = {}
+
+    for mode in ('cursor', 'copy'):
+        tracemalloc.start()
+        start = time.perf_counter()
+        passengers = []
+        for (station, i) in spawns:
+            passenger = Passenger(network.shapes[i], i)
+            if mode == 'cursor':
+                passenger.computeRoute(station)
+            else:
+                passenger = RoutePassenger(network.shapes[i], i, station.paths[i].copy())
+            passengers.append(passenger)
+        elapsed = time.perf_counter() - start
+        (current, _) = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+        results[mode] = {'seconds': elapsed, 'bytesPerPassenger': current / nbPassengers}
+        del passengers
+
+    print(results)
+    return results
+
+
+def heapqTree(R, targets):
+
+    '''Same search as Structures.shapeTree with heapq and lazy deletion: a vertex is pushed again each time its duration improves and the outdated entries are skipped when popped.'''
+
+    durations = np.full(len(R), float('inf'))
+    durations[targets] = 0
+    heap = [(0.0, u) for u in targets.tolist()]
+    heapq.heapify(heap)
+    done = np.zeros(len(R), dtype=bool)
+    (indptr, indices, weights) = (R.indptr.tolist(), R.indices.tolist(), R.weights.tolist())
+    while len(heap) != 0:
+        (k, u) = heapq.heappop(heap)
+        if done[u]:
+            continue
+        done[u] = True
+        for e in range(indptr[u], indptr[u + 1]):
+            v = indices[e]
+            if k + weights[e] < durations[v]:
+                durations[v] = k + weights[e]
+                heapq.heappush(heap, (durations[v], v))
+    return durations
+
+
+def durationError(a, b):
+    finite = np.isfinite(a) & np.isfinite(b)
+    if (np.isfinite(a) != np.isfinite(b)).any():
+        return float('inf')
+    return np.abs(a[finite] - b[finite]).max(initial=0)
+
+
+def pathHops(nextVertex):
+
+    '''Returns the largest number of edges of the trips given by the next vertices of a search tree.'''
+
+    hops = np.zeros(len(nextVertex), dtype=np.int64)
+    before = np.ones(len(nextVertex), dtype=np.int64)
+    while (hops != before).any():
+        before = hops
+        hops = np.where(nextVertex >= 0, before[nextVertex] + 1, 0)
+    return int(hops.max(initial=0))
+
+
+def benchmarkQueues(sizes=(100, 300), graphModel='full', repeat=3):
+
+    '''Times the per-shape searches of a stripe network with each queue, and heapqTree for reference. The durations found with every queue are checked against the ones of heapqTree, within resolution / 2 per edge of the trips for the bucket queues, which search the graph with rounded weights.'''
+
+    queues = {'PriorityQueue': PriorityQueue, 'daryHeap(2)': daryHeap(2), 'daryHeap(4)': daryHeap(4), 'daryHeap(8)': daryHeap(8), 'bucketQueue(1)': bucketQueue(1), 'bucketQueue(5)': bucketQueue(5)}
+    results = []
+
+    for n in sizes:
+        network = stripeNetwork(n, max(2, int(np.sqrt(n) / 2)), graphModel)
+        R = network.graph.reverse()
+        targets = [shapeTargets(network, i) for i in range(len(network.shapes))]
+        reference = [heapqTree(R, t) for t in targets]
+        result = {'stations': n, 'vertices': len(R), 'edges': R.edgeNumber()}
+        result['heapq'] = min([chrono(lambda: [heapqTree(R, t) for t in targets]) for _ in range(repeat)])
+        network.queue = PriorityQueue
+        hops = max([pathHops(shapeTree(network, i, R)[1]) for i in range(len(targets))])
+
+        for (name, queue) in queues.items():
+            network.queue = queue
+            Q = R.rounded(queue.resolution) if hasattr(queue, 'resolution') else R
+            result[name] = min([chrono(lambda: [shapeTree(network, i, Q) for i in range(len(targets))]) for _ in range(repeat)])
+            trees = [shapeTree(network, i, Q) for i in range(len(targets))]
+            error = max([durationError(D, d) for ((D, _), d) in zip(trees, reference)])
+            bound = 1e-9
+            if hasattr(queue, 'resolution'):
+                bound += queue.resolution / 2 * max([hops] + [pathHops(T) for (_, T) in trees])
+            if error > bound:
+                print(name, 'wrong durations', error, 'bound', bound)
+
+        results.append(result)
+        print(result)
+
+    return results
+
+
+def benchmarkIncremental(nbNetworks=12, nbStations=20, nbLines=3, mutations=30, graphModels=('full', 'compact'), seed=0):
+
+    '''Runs sequences of mutations of Genetic on random networks with incremental updates, and checks the trees and the durations of the stations after each of them against a full update of a copy. Prints the vertices settled by the repairs and the ones a full update would have settled on top of those.'''
+
+    from Genetic import mutate
+    results = []
+
+    for graphModel in graphModels:
+        result = {'graphModel': graphModel, 'updates': 0, 'wrong': 0}
+        work = {'settled': 0, 'skipped': 0}
+        for k in range(nbNetworks):
+            rnd.seed(seed + k)
+            network = randomEmptyNetwork(3, nbStations)
+            network.graphModel = graphModel
+            for nb in range(nbLines):
+                network.addLine(Line(nb, rnd.sample(range(nbStations), rnd.randint(3, 7)), [], rnd.random() < 0.5))
+                network.addTrain(Train(nb, 0, 0, [], 6))
+            network.incremental = True
+            network.updateAllPaths()
+            for _ in range(mutations):
+                mutate(network)
+                full = network.copy()
+                (full.incremental, full.trees) = (False, None)
+                full.updateAllPaths()
+                result['updates'] += 1
+                if max([durationError(a[0], b[0]) for (a, b) in zip(network.trees, full.trees)], default=0) > 1e-9 or [station.durations for station in network.stations] != [station.durations for station in full.stations]:
+                    result['wrong'] += 1
+            work = {key: work[key] + network.pathWork[key] for key in work}
+        result.update(work)
+        results.append(result)
+        print(result)
+
+    return results
+
+
+def benchmarkEngines(sizes=(50, 150, 400), ticks=5000, trains=1, spTime=None, crowded=150, seed=1):
+
+    '''Measures the ticks per second of oneEternityLater with each engine on stripe networks with trains trains per line, and spTime ticks between two spawns if it is given, then on a crowded network of crowded stations with 3 trains per line and a spawn every 2 ticks (skipped if crowded is None). The stations never overload, so that every run lasts all the ticks, and all the engines but counts, which does not keep the order of the passengers, must end in the same state.'''
+
+    results = []
+    cases = [(n, trains, spTime) for n in sizes] + ([] if crowded is None else [(crowded, 3, 2)])
+
+    for (n, trains, spTime) in cases:
+        network = stripeNetwork(n, max(2, int(np.sqrt(n) / 2)))
+        for line in network.lines:
+            for _ in range(trains - 1):
+                network.addTrain(Train(line.nb, 0, 0, [], 6))
+        for station in network.stations:
+            station.capacity = float('inf')
+            if spTime is not None:
+                station.spTime = spTime
+        result = {'stations': n, 'trains': sum([len(line.trains) for line in network.lines]), 'spTime': spTime}
+
+        for engine in ('objects', 'arrays', 'events', 'counts'):
+            copy = deepcopy(network)
+            copy.engine = engine
+            rnd.seed(seed)
+            result[engine] = ticks / chrono(copy.oneEternityLater, ticks)
+            transported = [s.transported for s in copy.stations]
+            if engine == 'objects':
+                reference = transported
+            elif engine != 'counts' and transported != reference:
+                print(engine, 'differs from objects')
+            result[engine + 'Transported'] = sum(transported)
+        results.append(result)
+        print(result)
+
+    return results
+
+
+def benchmarkEvents(sizes=(50, 150, 400), spTimes=(10, 100, 300), ticks=5000, seed=1):
+
+    '''Runs ArraySimulation and EventSimulation directly on stripe networks where every station spawns every spTime ticks, and prints their ticks per second with the density of events per tick of the network and the engine Network.simulation picks for engine='events'. EventSimulation only wins on the sparse networks, below EventSimulation.dense events per tick.'''
+
+    from FastSim import ArraySimulation, EventSimulation
+    results = []
+
+    for n in sizes:
+        for spTime in spTimes:
+            network = stripeNetwork(n, max(2, int(np.sqrt(n) / 2)))
+            network.engine = 'events'
+            for station in network.stations:
+                station.capacity = float('inf')
+                station.spTime = spTime
+            result = {'stations': n, 'spTime': spTime, 'density': EventSimulation.density(network), 'picked': type(network.simulation()).__name__}
+            for simulation in (ArraySimulation, EventSimulation):
+                copy = deepcopy(network)
+                rnd.seed(seed)
+                result[simulation.__name__] = ticks / chrono(simulation(copy).run, ticks)
+            results.append(result)
+            print(result)
+
+    return results
+
+
+def benchmarkReplicas(nbStations=150, replicas=(1, 16, 64), ticks=2000, seed=1):
+
+    '''Compares K runs of the arrays engine on deep copies of a stripe network with one ReplicaSimulation of K copies, and prints the mean and the variance of the end ticks of the copies (ticks if they did not end).'''
+
+    from FastSim import ReplicaSimulation
+    network = stripeNetwork(nbStations, max(2, int(np.sqrt(nbStations) / 2)))
+    results = []
+
+    for K in replicas:
+        def serial():
+            for r in range(K):
+                copy = deepcopy(network)
+                copy.engine = 'arrays'
+                rnd.seed(seed + r)
+                copy.oneEternityLater(ticks)
+        serialTime = chrono(serial)
+        start = time.perf_counter()
+        out = ReplicaSimulation(deepcopy(network), K, seed).run(ticks)
+        batchTime = time.perf_counter() - start
+        ends = np.where(out['end'] == -1, ticks, out['end'])
+
+        result = {'replicas': K, 'serial': serialTime, 'batched': batchTime, 'speedup': serialTime / batchTime, 'meanEnd': ends.mean(), 'varEnd': ends.var(), 'meanTransported': out['transported'].sum(axis=1).mean()}
+        results.append(result)
+        print(result)
+
+    return results
+
+
+def baselineCopy(network, structures):
+
+    '''Rebuilds network with the Passenger, Station, Line, Train and Network classes of structures, a module holding the model as it was before __slots__ and the path tables: every station keeps its own routes, and every passenger its own copy of the route it still has to follow.'''
+
+    passengers = lambda queue: [structures.Passenger(p.shape, p.shapeNb, p.route) for p in queue]
+    stations = []
+    for station in network.stations:
+        copy = structures.Station(station.idt, station.shape, passengers(station.waiting), list(station.lines), deepcopy(station.spRate), station.loc, station.spTime, station.capacity)
+        (copy.time, copy.overloadTime, copy.transported) = (station.time, station.overloadTime, station.transported)
+        copy.paths = [list(route) for route in station.table.paths(station.idt)] if station.table is not None else []
+        copy.durations = list(station.durations)
+        stations.append(copy)
+    lines = [structures.Line(line.nb, list(line.route), [structures.Train(train.line, train.nextDest, train.nextTime, passengers(train.passengers), train.capacity, train.direct) for train in line.trains], line.cyclic) for line in network.lines]
+    return structures.Network(stations, deepcopy(network.distances), lines, list(network.shapes))
+
+
+def traced(f, *args):
+    tracemalloc.start()
+    result = f(*args)
+    (current, _) = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, current
+
+
+def benchmarkMemory(nbStations=150, ticks=3000, seed=1, baseline=None):
+
+    '''Measures the bytes taken by a stripe network of nbStations stations, after ticks ticks where the stations never overload so that passengers pile up, and by one of its passengers. baseline is the path of a Structures.py to compare with, such as the one of the first commit (git show 972e253:Structures.py), whose model is rebuilt with baselineCopy.'''
+
+    network = stripeNetwork(nbStations, max(2, int(np.sqrt(nbStations) / 2)))
+    for station in network.stations:
+        station.capacity = float('inf')
+    rnd.seed(seed)
+    network.oneEternityLater(ticks)
+    passengers = [p for station in network.stations for p in station.waiting] + [p for line in network.lines for train in line.trains for p in train.passengers]
+
+    (_, slotted) = traced(deepcopy, network)
+    (_, slottedPassengers) = traced(lambda: [Passenger(p.shape, p.shapeNb, p.table, p.cursor) for p in passengers])
+    result = {'stations': nbStations, 'passengers': len(passengers), 'bytesPerNetwork': {'slots': slotted}, 'bytesPerPassenger': {'slots': slottedPassengers / len(passengers)}}
+
+    if baseline is not None:
+        spec = importlib.util.spec_from_file_location('baseline', baseline)
+        structures = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(structures)
+        (_, result['bytesPerNetwork']['baseline']) = traced(lambda: baselineCopy(network, structures))
+        (_, baselinePassengers) = traced(lambda: [structures.Passenger(p.shape, p.shapeNb, p.route) for p in passengers])
+        result['bytesPerPassenger']['baseline'] = baselinePassengers / len(passengers)
+    print(result)
+    return result
+
+
+def benchmarkSpawns(nbStations=150, nbSpawns=200000, ticks=3000, seed=1):
+
+    '''Times nbSpawns shape draws with random and the subtract loop of Station.spawn and with a SpawnSchedule, then the ticks per second of the objects and arrays engines with both, on a stripe network whose stations never overload. Two runs of each engine with the same seed and random seeded differently must end in the same state.'''
+
+    from FastSim import ArraySimulation
+    network = stripeNetwork(nbStations, max(2, int(np.sqrt(nbStations) / 2)))
+    for station in network.stations:
+        station.capacity = float('inf')
+    simulation = ArraySimulation(network)
+    stations = [s % nbStations for s in range(nbSpawns)]
+    result = {'stations': nbStations, 'random': chrono(lambda: [simulation.drawShape(s) for s in stations])}
+    simulation.spawns = SpawnSchedule(network, seed)
+    result['schedule'] = chrono(lambda: [simulation.drawShape(s) for s in stations])
+
+    for engine in ('objects', 'arrays'):
+        for spawns in (None, seed):
+            states = []
+            for r in range(2):
+                copy = deepcopy(network)
+                copy.engine = engine
+                copy.spawns = SpawnSchedule(copy, spawns) if spawns is not None else None
+                rnd.seed(r)
+                elapsed = chrono(copy.oneEternityLater, ticks)
+                states.append([(s.transported, s.nbWaiting) for s in copy.stations])
+            name = engine + ('Schedule' if spawns is not None else 'Random')
+            result[name] = ticks / elapsed
+            result[name + 'Reproducible'] = states[0] == states[1]
+
+    print(result)
+    return result
+
+
+def benchmarkSnapshots(nbStations=150, ticks=3000, repeat=100, seed=1):
+
+    '''Times deepcopy, Network.copy and a snapshot followed by a restore on a stripe network as it is built, like the ones Genetic copies, and after ticks ticks with passengers piled up at its stations, and checks that a copy then runs like a deep copy.'''
+
+    results = []
+
+    for elapsed in (0, ticks):
+        network = stripeNetwork(nbStations, max(2, int(np.sqrt(nbStations) / 2)))
+        for station in network.stations:
+            station.capacity = float('inf')
+        rnd.seed(seed)
+        network.oneEternityLater(elapsed)
+        snapshot = network.snapshot()
+
+        result = {'stations': nbStations, 'ticks': elapsed, 'passengers': sum([station.nbWaiting for station in network.stations])}
+        result['deepcopy'] = chrono(lambda: [deepcopy(network) for _ in range(repeat)]) / repeat
+        result['copy'] = chrono(lambda: [network.copy() for _ in range(repeat)]) / repeat
+        result['snapshot'] = chrono(lambda: [network.snapshot() for _ in range(repeat)]) / repeat
+        result['restore'] = chrono(lambda: [network.restore(snapshot) for _ in range(repeat)]) / repeat
+        result['speedup'] = result['deepcopy'] / result['copy']
+
+        runs = []
+        for copy in (deepcopy(network), network.copy()):
+            rnd.seed(seed)
+            copy.oneEternityLater(ticks)
+            runs.append([(s.transported, s.nbWaiting) for s in copy.stations])
+        result['sameRun'] = runs[0] == runs[1]
+        results.append(result)
+        print(result)
+
+    return results
+
+
+def benchmarkMonitor(nbNetworks=16, nbStations=60, ticks=4000, every=25, seed=0):
+
+    '''Runs nbNetworks random stripe networks, with random numbers of trains and spawn times, for ticks ticks or until they end, then again under a FailureMonitor. Compares the ticks spent, and for the runs that the monitor stopped, whether the network really ended and how far the predicted end was from the real one.'''
+
+    rnd.seed(seed)
+    settings = [(rnd.choice([2, 3, 4]), [rnd.choice([0, 1, 2, 4]) for _ in range(8)], rnd.choice([25, 40, 80, 150])) for _ in range(nbNetworks)]
+    result = {'networks': nbNetworks, 'fullTicks': 0, 'monitorTicks': 0, 'failures': 0, 'certain': 0, 'likely': 0, 'wrong': 0, 'meanError': 0}
+    errors = []
+
+    for (k, (nbLines, trains, spTime)) in enumerate(settings):
+        network = stripeNetwork(nbStations, nbLines, seed=seed + k)
+        for line in network.lines:
+            for _ in range(trains[line.nb]):
+                network.addTrain(Train(line.nb, 0, 0, [], 6))
+        for station in network.stations:
+            station.spTime = spTime
+        network.updateAllPaths()
+        network.engine = 'arrays'
+
+        full = network.copy()
+        rnd.seed(seed + k)
+        elapsed = 0
+        while elapsed < ticks and not full.end:
+            full.oneEternityLater(1)
+            elapsed += 1
+        result['fullTicks'] += elapsed
+        result['failures'] += full.end
+
+        monitor = FailureMonitor(network.copy(), every)
+        rnd.seed(seed + k)
+        (end, certain) = monitor.run(ticks)
+        result['monitorTicks'] += monitor.ticks
+        if end is not None and monitor.ticks < end:
+            result['certain' if certain else 'likely'] += 1
+            if not full.end:
+                result['wrong'] += 1
+            else:
+                errors.append(end - elapsed)
+
+    result['meanError'] = float(np.mean(errors)) if len(errors) != 0 else 0
+    result['saved'] = 1 - result['monitorTicks'] / result['fullTicks']
+    print(result)
+    return result
+
+
+def benchmarkCommonNumbers(nbStations=60, ticks=2000, runs=16, seed=0):
+
+    '''Compares a stripe network with a copy that has one more train, with compareNetworks, once with common random numbers and once with independent spawns. The stations never overload, so the networks only differ by the passengers they transport; the ratio of the variances of the difference tells how many more runs the independent spawns need for the same precision.'''
+
+    from Genetic import compareNetworks
+    network = stripeNetwork(nbStations, max(2, int(np.sqrt(nbStations) / 2)), seed=seed)
+    for station in network.stations:
+        station.capacity = float('inf')
+    candidate = network.copy()
+    candidate.addTrain(Train(0, 0, 0, [], 6))
+    candidate.updateAllPaths()
+
+    result = {'stations': nbStations, 'runs': runs}
+    for common in (True, False):
+        start = time.perf_counter()
+        comparison = compareNetworks([network, candidate], ticks, runs, seed, common)['transported']
+        name = 'common' if common else 'independent'
+        result[name] = {'difference': float(comparison['difference'][1]), 'stderr': float(comparison['stderr'][1]), 'seconds': time.perf_counter() - start}
+    result['runsFactor'] = (result['independent']['stderr'] / result['common']['stderr']) ** 2
+    print(result)
+    return result
+
+
+def benchmarkProfiler(nbStations=150, ticks=3000, seed=1):
+
+    '''Runs a stripe network whose stations never overload without a profiler and with a TickProfiler, checks that both end in the same state and prints the ticks per second of both and what the profiler measured.'''
+
+    network = stripeNetwork(nbStations, max(2, int(np.sqrt(nbStations) / 2)))
+    for station in network.stations:
+        station.capacity = float('inf')
+    result = {'stations': nbStations}
+    states = []
+
+    for profiler in (None, TickProfiler()):
+        copy = network.copy()
+        copy.profiler = profiler
+        rnd.seed(seed)
+        result['profiled' if profiler is not None else 'plain'] = ticks / chrono(copy.oneEternityLater, ticks)
+        states.append([(s.transported, s.nbWaiting) for s in copy.stations])
+    result['sameRun'] = states[0] == states[1]
+    result['profile'] = profiler.results()
+
+    print(result)
+    return result
+
+
+def benchmarkQueueing(nbNetworks=16, nbStations=60, ticks=4000, seed=0):
+
+    '''Builds nbNetworks random stripe networks like benchmarkMonitor, sorts them with screen, then runs each one for ticks ticks or until it ends with the arrays engine. Prints the time taken by queueingEstimate and by the runs, how many networks were kept, borderline or dropped, and how many of the kept ones ended and of the dropped ones lasted, with the correlation between the estimated and simulated mean numbers of waiting passengers of the stations of the networks that lasted.'''
+
+    rnd.seed(seed)
+    settings = [(rnd.choice([2, 3, 4]), [rnd.choice([0, 1, 2, 4]) for _ in range(8)], rnd.choice([25, 40, 80, 150])) for _ in range(nbNetworks)]
+    networks = []
+    for (k, (nbLines, trains, spTime)) in enumerate(settings):
+        network = stripeNetwork(nbStations, nbLines, seed=seed + k)
+        for line in network.lines:
+            for _ in range(trains[line.nb]):
+                network.addTrain(Train(line.nb, 0, 0, [], 6))
+        for station in network.stations:
+            station.spTime = spTime
+        network.updateAllPaths()
+        network.engine = 'arrays'
+        networks.append(network)
+
+    start = time.perf_counter()
+    estimates = [queueingEstimate(network) for network in networks]
+    estimated = (time.perf_counter() - start) / nbNetworks
+    (kept, borderline, dropped, risks) = screen(networks)
+
+    (ended, simulated, waiting, estimatedWaiting) = ([], 0, [], [])
+    for (k, network) in enumerate(networks):
+        copy = network.copy()
+        rnd.seed(seed + k)
+        start = time.perf_counter()
+        mean = np.zeros(nbStations)
+        while copy.tick < ticks and not copy.end:
+            copy.oneEternityLater(min(50, ticks - copy.tick))
+            mean += [station.nbWaiting for station in copy.stations]
+        simulated += time.perf_counter() - start
+        ended.append(copy.end)
+        if not copy.end and np.isfinite(estimates[k]['queue']).all():
+            waiting += (mean / (ticks // 50)).tolist()
+            estimatedWaiting += estimates[k]['queue'].tolist()
+
+    result = {'networks': nbNetworks, 'estimate': estimated, 'simulation': simulated / nbNetworks, 'kept': len(kept), 'borderline': len(borderline), 'dropped': len(dropped),
+              'keptEnded': sum([ended[k] for k in kept]), 'droppedLasted': sum([not ended[k] for k in dropped]), 'ended': sum(ended),
+              'waitingCorrelation': float(np.corrcoef(waiting, estimatedWaiting)[0, 1]) if len(waiting) > 1 else None}
+    print(result)
+    return result
+
+
+def benchmarkRacing(nbNetworks=32, nbStations=60, horizon=4000, ticks=500, keep=0.25, runs=2, seed=0):
+
+    '''Builds nbNetworks networks on the same stations, a stripe network with random trains added to its lines, ranks them with raceNetworks, then runs every network runs times to the horizon with compareNetworks. Prints the ticks spent by the race against the full evaluation, the time taken by both, the rank in the full evaluation of the winner of the race, the rank in the race of the best network of the full evaluation and the passengers lost by picking the winner of the race instead of it.'''
+
+    from Genetic import raceNetworks, compareNetworks
+
+    rnd.seed(seed)
+    base = stripeNetwork(nbStations, 3, seed=seed)
+    for station in base.stations:
+        station.spTime = 120
+    networks = []
+    for _ in range(nbNetworks):
+        network = base.copy()
+        for line in network.lines:
+            for _ in range(rnd.choice([0, 1, 2, 3])):
+                network.addTrain(Train(line.nb, rnd.randrange(len(line.route)), 0, [], rnd.choice([4, 6, 8])))
+        network.updateAllPaths()
+        network.engine = 'arrays'
+        networks.append(network)
+
+    start = time.perf_counter()
+    race = raceNetworks(networks, horizon, ticks, keep, runs, seed)
+    raced = time.perf_counter() - start
+    start = time.perf_counter()
+    full = compareNetworks(networks, horizon, runs, seed)
+    compared = time.perf_counter() - start
+    best = np.argsort(-full['transported']['mean'], kind='stable').tolist()
+
+    result = {'networks': nbNetworks, 'rounds': len(race['rounds']), 'runs': runs, 'lastRuns': race['rounds'][-1]['runs'], 'spent': race['spent'], 'full': race['full'], 'saved': race['saved'], 'raceTime': raced, 'fullTime': compared,
+              'winnerFullRank': best.index(race['ranking'][0]), 'bestRaceRank': race['ranking'].index(best[0]),
+              'regret': float(1 - full['transported']['mean'][race['ranking'][0]] / full['transported']['mean'][best[0]]), 'confidence': float(race['confidence'][race['ranking'][0]])}
+    print(result)
+    return result
+
+
+def benchmarkTrace(directory, nbStations=150, ticks=100000, engines=('objects', 'arrays'), seed=1):
+
+    '''Runs a stripe network whose stations never overload for ticks ticks with each engine, without and with a TraceRecorder writing into directory, and prints the overhead of the recording, the size of the trace and the time taken to read one frame back.'''
+
+    network = stripeNetwork(nbStations, max(2, int(np.sqrt(nbStations) / 2)))
+    for station in network.stations:
+        station.capacity = float('inf')
+    results = []
+
+    for engine in engines:
+        result = {'stations': nbStations, 'engine': engine, 'ticks': ticks}
+        for recording in (False, True):
+            copy = network.copy()
+            copy.engine = engine
+            if recording:
+                copy.recorder = TraceRecorder(directory, copy)
+            rnd.seed(seed)
+            result['recorded' if recording else 'plain'] = chrono(copy.oneEternityLater, ticks)
+        copy.recorder.close()
+        result['overhead'] = result['recorded'] / result['plain'] - 1
+        result['bytes'] = sum([os.path.getsize(os.path.join(directory, name)) for name in os.listdir(directory)])
+        result['frame'] = chrono(lambda: Trace(directory).frame(ticks // 2))
+        results.append(result)
+        print(result)
+
+    return results
+
+
+def benchmarkReplay(directory, frames=100, seed=0):
+
+    '''Opens the trace written into directory, by benchmarkTrace for instance, with a Replay, and prints the time taken to open it and to seek and draw frames frames picked at random, read from the trace and rendered without a window.'''
+
+    start = time.perf_counter()
+    replay = Replay(directory)
+    opened = time.perf_counter() - start
+    replay.draw()
+    picks = np.random.default_rng(seed).integers(0, len(replay), frames)
+
+    def render():
+        for i in picks:
+            replay.show(int(i))
+            replay.figure.canvas.draw()
+
+    result = {'ticks': len(replay), 'open': opened, 'frame': chrono(render) / frames}
+    print(result)
+    return result
@@ -0,0 +1,135 @@
+import numpy as np
+from heapq import heappush, heappop
+
+
+
+class CCH:
+
+    '''A CCH object is a customizable contraction hierarchy over the topology of a graph, contracting its vertices by minimum degree without looking at the weights. customize weighs the hierarchy from a graph with the same edges, which is all that changes when only the trains change, and shapeTree answers a nearest-shape query for every vertex in two sweeps.'''
+
+    def __init__(self, graph):
+        self.indptr = graph.indptr.copy()
+        self.indices = graph.indices.copy()
+        N = len(graph)
+        self.size = N
+        tails = graph.tails()
+        loops = tails != graph.indices
+
+        neighbours = [set() for _ in range(N)]
+        for (u, v) in zip(tails[loops].tolist(), graph.indices[loops].tolist()):
+            neighbours[u].add(v)
+            neighbours[v].add(u)
+
+        self.rank = np.zeros(N, dtype=np.int64)
+        upper = [None for _ in range(N)]
+        heap = [(len(neighbours[u]), u) for u in range(N)]
+        heap.sort()
+        eliminated = [False for _ in range(N)]
+        r = 0
+
+        while len(heap) != 0:
+            (d, x) = heappop(heap)
+            if eliminated[x] or d != len(neighbours[x]):
+                continue
+            eliminated[x] = True
+            self.rank[x] = r
+            r += 1
+            upper[x] = neighbours[x]
+            for y in upper[x]:
+                neighbours[y].discard(x)
+                neighbours[y] |= upper[x]
+                neighbours[y].discard(y)
+                heappush(heap, (len(neighbours[y]), y))
+
+        order = np.argsort(self.rank)
+        self.low = np.array([x for x in order.tolist() for _ in upper[x]], dtype=np.int64)
+        self.high = np.array([y for x in order.tolist() for y in sorted(upper[x], key=lambda y: self.rank[y])], dtype=np.int64)
+        keys = self.low * N + self.high
+        self.keyOrder = np.argsort(keys)
+        self.keys = keys[self.keyOrder]
+        first = np.concatenate(([0], np.cumsum([len(upper[x]) for x in order.tolist()])))
+
+        (X, E1, E2, E3) = ([], [], [], [])
+        for i in range(N):
+            (a, b) = (first[i], first[i + 1])
+            if b - a > 1:
+                (I, J) = np.triu_indices(b - a, 1)
+                X.append(np.full(len(I), order[i]))
+                E1.append(a + I)
+                E2.append(a + J)
+                E3.append(self.edge(self.high[a + I], self.high[a + J]))
+        self.triangles = [np.concatenate(T) if len(T) != 0 else np.zeros(0, dtype=np.int64) for T in (X, E1, E2, E3)]
+
+        depth = np.zeros(N, dtype=np.int64)
+        for (x, y) in zip(self.low.tolist(), self.high.tolist()):
+            depth[y] = max(depth[y], depth[x] + 1)
+        height = np.zeros(N, dtype=np.int64)
+        for (x, y) in zip(self.low[::-1].tolist(), self.high[::-1].tolist()):
+            height[x] = max(height[x], height[y] + 1)
+        self.upward = self.levels(depth[self.low])
+        self.downward = self.levels(height[self.low])
+        self.triangleLevels = self.levels(depth[self.triangles[0]])
+
+        lowRank = self.rank[tails] < self.rank[graph.indices]
+        self.inputUp = lowRank & loops
+        self.inputDown = ~lowRank & loops
+        (a, b) = (np.where(lowRank, tails, graph.indices), np.where(lowRank, graph.indices, tails))
+        self.inputEdge = self.edge(a, b)
+        self.up = None
+        self.down = None
+
+    def edge(self, a, b):
+        return self.keyOrder[np.minimum(np.searchsorted(self.keys, a * self.size + b), len(self.keys) - 1)]
+
+    @staticmethod
+    def levels(level):
+        order = np.argsort(level, kind='stable')
+        bounds = np.flatnonzero(np.diff(level[order])) + 1
+        return np.split(order, bounds)
+
+    def sameTopology(self, graph):
+        return np.array_equal(self.indptr, graph.indptr) and np.array_equal(self.indices, graph.indices)
+
+    def customize(self, weights):
+        self.weights = weights
+        self.up = np.full(len(self.low), float('inf'))
+        self.down = np.full(len(self.low), float('inf'))
+        np.minimum.at(self.up, self.inputEdge[self.inputUp], weights[self.inputUp])
+        np.minimum.at(self.down, self.inputEdge[self.inputDown], weights[self.inputDown])
+
+        (_, E1, E2, E3) = self.triangles
+        for T in self.triangleLevels:
+            np.minimum.at(self.up, E3[T], self.down[E1[T]] + self.up[E2[T]])
+            np.minimum.at(self.down, E3[T], self.down[E2[T]] + self.up[E1[T]])
+
+    def distances(self, targets):
+        D = np.full(self.size, float('inf'))
+        D[targets] = 0
+        for E in self.upward:
+            np.minimum.at(D, self.high[E], self.down[E] + D[self.low[E]])
+        for E in self.downward:
+            np.minimum.at(D, self.low[E], self.up[E] + D[self.high[E]])
+        return D
+
+    def shapeTree(self, graph, targets):
+
+        '''Returns the same trees as Structures.shapeTree. The durations come from the hierarchy, then each vertex is linked to a neighbour that is tight for these durations, in rounds starting from the targets so that the links never make a cycle through edges of weight zero.'''
+
+        durations = self.distances(targets)
+        nextVertex = np.full(self.size, -1, dtype=np.int64)
+        tails = graph.tails()
+        slack = graph.weights + durations[graph.indices] - durations[tails]
+        tight = np.isfinite(durations[tails]) & (np.abs(slack) <= 1e-9 * (1 + durations[tails]))
+        (T, H) = (tails[tight], graph.indices[tight])
+        linked = np.zeros(self.size, dtype=bool)
+        linked[targets] = True
+
+        while True:
+            candidates = ~linked[T] & linked[H]
+            if not candidates.any():
+                break
+            (V, first) = np.unique(T[candidates], return_index=True)
+            nextVertex[V] = H[candidates][first]
+            linked[V] = True
+
+        return durations, nextVertex
@@ -0,0 +1,79 @@
+import numpy as np
+from scipy.sparse import csr_matrix
+
+
+
+class CSRGraph:
+
+    '''A CSRGraph object is a weighted directed graph stored in compressed sparse row form. The edges leaving the vertex u are the ones between indptr[u] and indptr[u + 1] in the arrays indices (the heads of the edges) and weights. It can be given as is to SciPy with toScipy.'''
+
+    def __init__(self, indptr, indices, weights):
+        self.indptr = indptr
+        self.indices = indices
+        self.weights = weights
+
+    @staticmethod
+    def fromEdges(size, tails, heads, weights):
+        tails = np.asarray(tails, dtype=np.int64)
+        order = np.argsort(tails, kind='stable')
+        indptr = np.zeros(size + 1, dtype=np.int64)
+        np.cumsum(np.bincount(tails, minlength=size), out=indptr[1:])
+        indices = np.asarray(heads, dtype=np.int32)[order]
+        weights = np.asarray(weights, dtype=np.float64)[order]
+        return CSRGraph(indptr, indices, weights)
+
+    @staticmethod
+    def fromLists(G):
+        tails = [u for u in range(len(G)) for _ in G[u]]
+        heads = [v for edges in G for (v, _) in edges]
+        weights = [w for edges in G for (_, w) in edges]
+        return CSRGraph.fromEdges(len(G), tails, heads, weights)
+
+    def __len__(self):
+        return len(self.indptr) - 1
+
+    def __getitem__(self, u):
+        a, b = self.indptr[u], self.indptr[u + 1]
+        return list(zip(self.indices[a:b].tolist(), self.weights[a:b].tolist()))
+
+    def edgeNumber(self):
+        return len(self.indices)
+
+    def tails(self):
+        return np.repeat(np.arange(len(self), dtype=np.int32), np.diff(self.indptr))
+
+    def reverse(self):
+        return CSRGraph.fromEdges(len(self), self.indices, self.tails(), self.weights)
+
+    def rounded(self, resolution):
+        return CSRGraph(self.indptr, self.indices, np.round(self.weights / resolution) * resolution)
+
+    def changedRows(self, other):
+        before = np.diff(other.indptr)
+        changed = np.diff(self.indptr) != before
+        mine = ~changed[self.tails()]
+        theirs = ~changed[other.tails()]
+        differ = (self.indices[mine] != other.indices[theirs]) | (self.weights[mine] != other.weights[theirs])
+        changed[self.tails()[mine][differ]] = True
+        return changed
+
+    def restrict(self, keep):
+        tails = self.tails()[keep]
+        self.indptr = np.zeros(len(self) + 1, dtype=np.int64)
+        np.cumsum(np.bincount(tails, minlength=len(self)), out=self.indptr[1:])
+        self.indices = self.indices[keep]
+        self.weights = self.weights[keep]
+
+    def relax(self, U, u, k, durations, parents):
+        a, b = self.indptr[u], self.indptr[u + 1]
+        for (v, w) in zip(self.indices[a:b].tolist(), self.weights[a:b].tolist()):
+            if durations[v] > w - k:
+                U.changePrio(v, k - w)
+                durations[v] = - U.priority(v)
+                parents[v] = u
+
+    def nbytes(self):
+        return self.indptr.nbytes + self.indices.nbytes + self.weights.nbytes
+
+    def toScipy(self):
+        return csr_matrix((self.weights, self.indices, self.indptr), shape=(len(self), len(self)))
@@ -0,0 +1,86 @@
+import numpy as np
+
+
+
+class FailureMonitor:
+
+    '''A FailureMonitor object runs a network every ticks at a time and stops it once a station is bound to overload: surely when its passengers spawn faster than its trains take them, likely when it is overloaded and its waiting passengers trend up. run(n) returns the tick the network ended or is predicted to end and whether it is certain (the only failures that stop it with certainOnly), or (None, False) if it lasted the n ticks.'''
+
+    def __init__(self, network, every=50, window=8, certainOnly=False):
+        self.network = network
+        self.every = every
+        self.window = window
+        self.certainOnly = certainOnly
+        self.ticks = 0
+        self.station = None
+
+    def rates(self):
+        network = self.network
+        stations = network.stations
+        n = len(stations)
+        self.arrival = np.array([sum([ratio for (_, ratio) in station.spRate]) / (station.spTime + 1) for station in stations])
+        self.deterministic = np.array([abs(sum([ratio for (_, ratio) in station.spRate]) - 1) < 1e-9 for station in stations])
+        self.service = np.zeros(n)
+        self.slack = np.zeros(n)
+        for line in network.lines:
+            route = list(line.route)
+            if len(route) < 2 or len(line.trains) == 0:
+                continue
+            legs = [network.distances[route[k]][route[k + 1]] + 1 for k in range(len(route) - 1)]
+            capacity = sum([train.capacity for train in line.trains])
+            if line.cyclic:
+                period = sum(legs) + network.distances[route[-1]][route[0]] + 1
+                visits = np.ones(len(route))
+            else:
+                period = 2 * sum(legs)
+                visits = np.full(len(route), 2.0)
+                visits[[0, -1]] = 1
+            np.add.at(self.service, route, visits * capacity / period)
+            np.add.at(self.slack, route, (visits + 1) * capacity)
+        self.history = []
+
+    def check(self, last):
+        stations = self.network.stations
+        now = self.ticks
+        waiting = np.array([station.nbWaiting for station in stations], dtype=np.float64)
+        stuck = np.array([len(station.queues.get(None, ())) for station in stations], dtype=np.float64)
+        overload = np.array([station.overloadTime for station in stations], dtype=np.float64)
+        capacity = np.array([station.capacity for station in stations], dtype=np.float64)
+        remaining = 100 - overload
+
+        growth = self.arrival - self.service
+        lowest = waiting - 1 - self.slack
+        start = np.where(lowest > capacity, 0, np.ceil((capacity + 1 - lowest) / np.where(growth > 0, growth, 1)))
+        certainEnd = now + start + np.where(start == 0, remaining, 100) + 1
+        certainEnd = np.where((growth > 0) & self.deterministic, certainEnd, np.inf)
+        certainEnd = np.where(stuck > capacity, now + remaining + 1, certainEnd)
+
+        self.history.append(waiting)
+        likelyEnd = np.full(len(stations), np.inf)
+        if not self.certainOnly and len(self.history) >= self.window:
+            self.history = self.history[-self.window:]
+            x = self.every * np.arange(self.window, dtype=np.float64)
+            slope = np.polyfit(x, np.array(self.history), 1)[0]
+            likelyEnd = np.where((slope > 0) & (waiting > capacity) & (overload > 0), now + remaining + 1, np.inf)
+
+        for (end, certain) in ((certainEnd, True), (likelyEnd, False)):
+            s = int(np.argmin(end)) if len(end) != 0 else 0
+            if len(end) != 0 and end[s] <= last:
+                self.station = s
+                return int(end[s]), certain
+        return None
+
+    def run(self, n):
+        network = self.network
+        self.rates()
+        last = self.ticks + n
+        while self.ticks < last and not network.end:
+            prediction = self.check(last)
+            if prediction is not None:
+                return prediction
+            k = min(self.every, last - self.ticks)
+            network.oneEternityLater(k)
+            self.ticks += k
+        if network.end:
+            return self.ticks, True
+        return None, False
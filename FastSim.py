@@ -0,0 +1,586 @@
+import numpy as np
+import random as rnd
+from heapq import heapify, heappush, heappop
+from Structures import Passenger
+
+
+
+class ArraySimulation:
+
+    '''An ArraySimulation object runs the same ticks as Network.nextState on arrays instead of objects, with the timers and overload counters in NumPy arrays and every passenger an integer code (cursor + 1) * k + shapeNb, queued at its station by the line it waits for. It draws the same random numbers as the objects, so both give the same run, and store writes the state back into the network.'''
+
+    def __init__(self, network):
+        self.network = network
+        stations = network.stations
+        n = len(stations)
+        p = len(network.lines)
+        k = len(network.shapes)
+        for station in stations:
+            if len(station.spRate) > k or any([shape != network.shapes[i] for (i, (shape, _)) in enumerate(station.spRate)]):
+                raise ValueError('the spawn rates of the station ' + str(station.idt) + ' are not indexed like network.shapes, which the arrays engines need: use the objects engine')
+        self.k = k
+        self.end = network.end
+        self.tick = 0
+        self.recorder = network.recorder
+        table = network.table
+
+        shapeNb = np.tile(np.arange(k), n * p + 1)
+        cursor = np.repeat(np.arange(-1, n * p), k)
+        goal = np.full(len(cursor), -1, dtype=np.int64)
+        if table is not None and n * p != 0:
+            hops = np.array(table.hops).reshape(k, n * p)
+            goal[cursor != -1] = hops[shapeNb[cursor != -1], cursor[cursor != -1]]
+        self.codeShape = np.asarray(network.shapes)[shapeNb].tolist()
+        self.codeStation = np.where(goal == -1, -1, goal % max(n, 1)).tolist()
+        self.codeLine = np.where(goal == -1, -1, goal // max(n, 1)).tolist()
+        self.codeAlight = ((goal + 1) * k + shapeNb).tolist()
+        self.codeQueue = np.where(goal == -1, n * p, goal // max(n, 1) * n).tolist()
+        if table is None:
+            self.spawnCodes = [[i for i in range(k)] for _ in range(n)]
+        else:
+            self.spawnCodes = [[int(table.starts[i][s] + 1) * k + i for i in range(k)] for s in range(n)]
+
+        self.stationShape = [station.shape for station in stations]
+        self.rates = [[ratio for (_, ratio) in station.spRate] for station in stations]
+        self.rateTable = np.zeros((n, k))
+        for s in range(n):
+            self.rateTable[s, :len(self.rates[s])] = self.rates[s]
+        self.spawns = network.spawns
+        self.spTime = [station.spTime for station in stations]
+        self.capacity = [station.capacity for station in stations]
+        self.limit = np.array(self.capacity, dtype=np.float64)
+        self.period = np.array(self.spTime, dtype=np.float64)
+        self.batch = 16
+        (self.due, self.spawned) = ([], 0)
+        self.overload = np.array([station.overloadTime for station in stations], dtype=np.int64)
+        self.transported = [station.transported for station in stations]
+        self.n = n
+        self.queues = [[] for _ in range(n * p + n)]
+        self.heads = [0 for _ in range(n * p + n)]
+        self.size = [0 for _ in range(n)]
+        for station in stations:
+            for passenger in station.waiting:
+                ArraySimulation.enqueue(self, station.idt, self.encode(passenger, station.idt))
+        self.step = np.array([1 if self.capacity[s] < self.size[s] else -1 for s in range(n)], dtype=np.int64)
+
+        self.routes = [list(line.route) for line in network.lines]
+        self.cyclic = [line.cyclic for line in network.lines]
+        self.trains = [train for line in network.lines for train in line.trains]
+        self.trainLine = [line.nb for line in network.lines for _ in line.trains]
+        self.nextDest = [train.nextDest for train in self.trains]
+        self.direct = [train.direct for train in self.trains]
+        self.trainCapacity = [train.capacity for train in self.trains]
+        self.clock = np.array([station.spTime - station.time for station in stations] + [train.nextTime for train in self.trains], dtype=np.float64)
+        self.onboard = [[self.encode(passenger, self.lastStation(t)) for passenger in self.trains[t].passengers] for t in range(len(self.trains))]
+        self.distances = network.distances
+
+    def encode(self, passenger, station):
+        if passenger.table is self.network.table:
+            return (passenger.cursor + 1) * self.k + passenger.shapeNb
+        return self.spawnCodes[station][passenger.shapeNb]
+
+    def enqueue(self, s, c):
+        self.queues[s + self.codeQueue[c]].append(c)
+        self.size[s] += 1
+
+    def lastStation(self, t):
+        route = self.routes[self.trainLine[t]]
+        if self.direct[t]:
+            return route[(self.nextDest[t] - 1) % len(route)]
+        return route[(self.nextDest[t] + 1) % len(route)]
+
+    def nextState(self):
+        n = len(self.spTime)
+        due = (self.clock == 0).nonzero()[0].tolist()
+        self.clock -= 1
+        i = 0
+        while i < len(due) and due[i] < n:
+            i += 1
+        (self.due, self.spawned) = (due, i)
+        if i > self.batch:
+            self.spawnAll(due[:i])
+        else:
+            for s in due[:i]:
+                self.spawn(s)
+
+        if self.overload.max(initial=0) >= 100:
+            self.end = True
+            self.overload = np.where(self.overload >= 100, self.overload, np.maximum(self.overload + self.step, 0))
+        else:
+            np.maximum(self.overload + self.step, 0, out=self.overload)
+
+        for t in due[i:]:
+            self.arrive(t - n)
+
+    def drawShape(self, s):
+        if self.spawns is not None:
+            return self.spawns.draw(s)
+        r = rnd.random()
+        rates = self.rates[s]
+        for i in range(len(rates)):
+            if r < rates[i]:
+                return i
+            else:
+                r -= rates[i]
+        return -1
+
+    def drawShapes(self, spawning):
+        if self.spawns is not None:
+            return np.array([self.spawns.draw(s) for s in spawning.tolist()], dtype=np.int64)
+        r = np.array([rnd.random() for _ in range(len(spawning))])
+        shapes = np.full(len(spawning), -1)
+        for i in range(self.k):
+            rates = self.rateTable[spawning, i]
+            drawn = (shapes == -1) & (r < rates)
+            shapes[drawn] = i
+            r -= rates
+        return shapes
+
+    def spawnAll(self, spawning):
+        spawning = np.array(spawning)
+        self.clock[spawning] = self.period[spawning]
+        spawnCodes = self.spawnCodes
+        for (s, i) in zip(spawning.tolist(), self.drawShapes(spawning).tolist()):
+            if i != -1:
+                self.enqueue(s, spawnCodes[s][i])
+        self.step = np.where(self.limit < self.size, 1, -1)
+
+    def spawn(self, s):
+        self.clock[s] = self.spTime[s]
+        i = self.drawShape(s)
+        if i != -1:
+            self.enqueue(s, self.spawnCodes[s][i])
+            self.crowd(s)
+
+    def crowd(self, s):
+        self.step[s] = 1 if self.capacity[s] < self.size[s] else -1
+
+    def move(self, t):
+        l = self.trainLine[t]
+        route = self.routes[l]
+        d = self.nextDest[t]
+        s = route[d]
+        if not self.cyclic[l] and d == len(route) - 1:
+            self.direct[t] = False
+        elif not self.cyclic[l] and d == 0:
+            self.direct[t] = True
+        if self.direct[t]:
+            d = (d + 1) % len(route)
+        else:
+            d = (d - 1) % len(route)
+        self.nextDest[t] = d
+        self.clock[len(self.spTime) + t] = self.distances[s][route[d]]
+        return l, s
+
+    def arrive(self, t):
+        (l, s) = self.move(t)
+        (codeShape, codeStation, codeAlight) = (self.codeShape, self.codeStation, self.codeAlight)
+        shape = self.stationShape[s]
+        stillGoing = []
+        for c in self.onboard[t]:
+            if codeShape[c] == shape:
+                self.transported[s] += 1
+            elif codeStation[c] == s:
+                self.enqueue(s, codeAlight[c])
+            else:
+                stillGoing.append(c)
+
+        q = s + self.n * l
+        (queue, head) = (self.queues[q], self.heads[q])
+        m = min(self.trainCapacity[t] - len(stillGoing), len(queue) - head)
+        if m > 0:
+            stillGoing += queue[head:head + m]
+            self.size[s] -= m
+            head += m
+            if head == len(queue):
+                queue.clear()
+                head = 0
+            elif 2 * head > len(queue):
+                del queue[:head]
+                head = 0
+            self.heads[q] = head
+        self.onboard[t] = stillGoing
+        self.crowd(s)
+
+    def run(self, n):
+        while n > 0 and not self.end:
+            self.nextState()
+            self.tick += 1
+            n -= 1
+            if self.recorder is not None:
+                self.recorder.recordSimulation(self, self.network.tick + self.tick)
+        return self.end
+
+    def waitingAt(self, s):
+        return self.size[s]
+
+    def waitingCodes(self, s):
+        n = self.n
+        return [c for q in range(s, len(self.queues), n) for c in self.queues[q][self.heads[q]:]]
+
+    def loadAt(self, t):
+        return len(self.onboard[t])
+
+    def decode(self, c):
+        (cursor, shapeNb) = divmod(c, self.k)
+        return Passenger(self.network.shapes[shapeNb], shapeNb, self.network.table, cursor - 1)
+
+    def store(self):
+        network = self.network
+        network.end = self.end
+        for station in network.stations:
+            s = station.idt
+            station.time = int(station.spTime - self.clock[s])
+            station.overloadTime = int(self.overload[s])
+            station.transported = self.transported[s]
+            station.waiting = [self.decode(c) for c in self.waitingCodes(s)]
+        for t in range(len(self.trains)):
+            train = self.trains[t]
+            train.nextDest = self.nextDest[t]
+            train.nextTime = self.clock[len(network.stations) + t].item()
+            train.direct = self.direct[t]
+            train.passengers = [self.decode(c) for c in self.onboard[t]]
+
+
+
+class EventSimulation(ArraySimulation):
+
+    '''An EventSimulation object gives the same runs as ArraySimulation without visiting the ticks where nothing happens: a heap holds the next spawns, arrivals and overload ends, and an overload counter is only updated when its station crosses its capacity. It is only faster on sparse networks (see density), so Network.simulation runs the denser ones with ArraySimulation.'''
+
+    dense = 4
+
+    @staticmethod
+    def density(network):
+        spawns = sum([1 / (station.spTime + 1) for station in network.stations])
+        arrivals = sum([len(line.trains) * len(line.route) / (line.metrics(network.distances).cycleLength + len(line.route)) for line in network.lines if len(line.route) > 1])
+        return float(spawns + arrivals)
+
+    def __init__(self, network):
+        ArraySimulation.__init__(self, network)
+        n = len(self.spTime)
+        self.tick = 0
+        self.now = 0
+        self.endTick = None
+        self.level = self.overload.tolist()
+        self.step = self.step.tolist()
+        self.since = [0 for _ in range(n)]
+        self.version = [0 for _ in range(n)]
+        self.clock = self.clock.tolist()
+        self.ref = [0 for _ in self.clock]
+        self.events = []
+        for x in range(len(self.clock)):
+            self.schedule(x)
+        for s in range(n):
+            self.threshold(s)
+        heapify(self.events)
+
+    def schedule(self, x):
+        c = self.clock[x]
+        if c >= 0 and c == int(c):
+            n = len(self.spTime)
+            if x < n:
+                heappush(self.events, (self.ref[x] + int(c) + 1, 0, 2 * x, 0))
+            else:
+                heappush(self.events, (self.ref[x] + int(c) + 1, 1, x - n, 0))
+
+    def threshold(self, s):
+        if self.step[s] == 1:
+            heappush(self.events, (self.since[s] + 1 + max(0, 100 - self.level[s]), 0, 2 * s + 1, self.version[s]))
+        elif self.level[s] >= 100:
+            heappush(self.events, (self.since[s] + 1, 0, 2 * s + 1, self.version[s]))
+
+    def overloadAt(self, s, tick):
+        (level, elapsed) = (self.level[s], tick - self.since[s])
+        if level >= 100 and self.step[s] == -1:
+            return level
+        if self.step[s] == 1:
+            return min(level + elapsed, max(level, 100))
+        return max(level - elapsed, 0)
+
+    def crowd(self, s):
+        step = 1 if self.capacity[s] < self.size[s] else -1
+        if step != self.step[s]:
+            self.level[s] = self.overloadAt(s, self.now)
+            self.since[s] = self.now
+            self.step[s] = step
+            self.version[s] += 1
+            self.threshold(s)
+
+    def nextState(self):
+        self.run(1)
+
+    def run(self, n):
+        if self.end:
+            return True
+        last = self.tick + n
+        while len(self.events) != 0 and self.events[0][0] <= last and not (self.end and self.events[0][0] > self.endTick):
+            (tick, phase, order, version) = heappop(self.events)
+            if phase == 0 and order % 2 == 0:
+                self.now = tick - 1
+                self.spawn(order // 2)
+                self.ref[order // 2] = tick
+                self.schedule(order // 2)
+            elif phase == 0 and version == self.version[order // 2]:
+                self.end = True
+                self.endTick = tick
+            elif phase == 1:
+                self.now = tick
+                self.arrive(order)
+                self.ref[len(self.spTime) + order] = tick
+                self.schedule(len(self.spTime) + order)
+        self.tick = self.endTick if self.end and self.endTick is not None else max(self.tick, last)
+        return self.end
+
+    def store(self):
+        self.overload = [self.overloadAt(s, self.tick) for s in range(len(self.spTime))]
+        self.clock = np.array([self.clock[x] - (self.tick - self.ref[x]) for x in range(len(self.clock))])
+        ArraySimulation.store(self)
+
+
+
+class ReplicaSimulation(ArraySimulation):
+
+    '''A ReplicaSimulation object runs K independent copies of a network in lockstep: the spawn times and the moves of the trains are shared, and the queues, trains, counters and end ticks get a replica axis. Each copy draws its shapes from its own generator spawned from seed, and a copy that ends is frozen while the others go on.'''
+
+    def __init__(self, network, K, seed=None):
+        ArraySimulation.__init__(self, network)
+        n = len(self.spTime)
+        self.K = K
+        self.generators = [np.random.default_rng(s) for s in np.random.SeedSequence(seed).spawn(K)]
+        self.draws = np.zeros((K, 0))
+        self.drawn = 0
+        rates = np.zeros((n, self.k))
+        for s in range(n):
+            rates[s, :len(self.rates[s])] = self.rates[s]
+        self.bounds = np.cumsum(rates, axis=1)
+        self.spawnCodes = np.array(self.spawnCodes, dtype=np.int64).reshape(n, self.k)
+        self.codeShape = np.array(self.codeShape)
+        self.codeStation = np.array(self.codeStation)
+        self.codeLine = np.array(self.codeLine)
+        self.codeAlight = np.array(self.codeAlight)
+        self.shapeOf = np.array(self.stationShape)
+        self.spTime = np.array(self.spTime)
+        self.capacity = np.array(self.capacity, dtype=np.float64)
+
+        waiting = [ArraySimulation.waitingCodes(self, s) for s in range(n)]
+        self.queues = np.zeros((K, n, max([len(w) for w in waiting] + [8])), dtype=np.int64)
+        self.lengths = np.zeros((K, n), dtype=np.int64)
+        for s in range(n):
+            self.queues[:, s, :len(waiting[s])] = waiting[s]
+            self.lengths[:, s] = len(waiting[s])
+        self.stored = 0
+        self.loads = np.zeros((K, len(self.trains), max(self.trainCapacity + [1])), dtype=np.int64)
+        self.riders = np.zeros((K, len(self.trains)), dtype=np.int64)
+        for t in range(len(self.trains)):
+            self.loads[:, t, :len(self.onboard[t])] = self.onboard[t]
+            self.riders[:, t] = len(self.onboard[t])
+
+        self.overload = np.tile(self.overload, (K, 1))
+        self.transported = np.tile(np.array(self.transported, dtype=np.int64), (K, 1))
+        self.alive = np.full(K, not self.end)
+        self.endTick = np.full(K, -1)
+        self.tick = 0
+        self.trace = []
+
+    def uniforms(self, m):
+        if self.drawn + m > self.draws.shape[1]:
+            size = max(m, 1024)
+            self.draws = np.concatenate([self.draws[:, self.drawn:], np.array([g.random(size) for g in self.generators])], axis=1)
+            self.drawn = 0
+        r = self.draws[:, self.drawn:self.drawn + m]
+        self.drawn += m
+        return r
+
+    def grow(self, size):
+        if size > self.queues.shape[2]:
+            grown = np.zeros((self.K, self.queues.shape[1], 2 * size), dtype=np.int64)
+            grown[:, :, :self.queues.shape[2]] = self.queues
+            self.queues = grown
+
+    def push(self, s, codes, mask):
+        places = self.lengths[:, s, None] + np.cumsum(mask, axis=1) - 1
+        self.grow(self.lengths[:, s].max(initial=0) + codes.shape[1])
+        (rows, columns) = np.nonzero(mask)
+        self.queues[rows, s, places[rows, columns]] = codes[rows, columns]
+        self.lengths[:, s] += mask.sum(axis=1)
+
+    def nextState(self):
+        n = len(self.spTime)
+        self.tick += 1
+        due = (self.clock == 0).nonzero()[0]
+        self.clock -= 1
+        spawning = due[due < n]
+
+        if len(spawning) != 0:
+            self.clock[spawning] = self.spTime[spawning]
+            shapeNb = (self.uniforms(len(spawning))[:, :, None] >= self.bounds[spawning][None, :, :]).sum(axis=2)
+            (rows, columns) = np.nonzero(self.alive[:, None] & (shapeNb < self.k))
+            stations = spawning[columns]
+            self.grow(self.lengths.max(initial=0) + 1)
+            self.queues[rows, stations, self.lengths[rows, stations]] = self.spawnCodes[stations, shapeNb[rows, columns]]
+            self.lengths[rows, stations] += 1
+
+        crowded = self.capacity < self.lengths
+        full = self.overload >= 100
+        moved = np.where(full, self.overload, np.maximum(self.overload + np.where(crowded, 1, -1), 0))
+        self.overload = np.where(self.alive[:, None], moved, self.overload)
+        ending = self.alive & full.any(axis=1)
+        self.endTick[ending] = self.tick
+
+        for t in (due[due >= n] - n).tolist():
+            self.arrive(t)
+
+        self.trace.append(self.overload.max(axis=1, initial=0))
+        self.alive &= ~ending
+
+    def arrive(self, t):
+        (l, s) = self.move(t)
+        alive = self.alive[:, None]
+        onboard = self.loads[:, t, :]
+        valid = alive & (np.arange(onboard.shape[1]) < self.riders[:, t, None])
+        delivered = valid & (self.codeShape[onboard] == self.shapeOf[s])
+        alighting = valid & ~delivered & (self.codeStation[onboard] == s)
+        going = (valid & ~delivered & ~alighting) | (~alive & (np.arange(onboard.shape[1]) < self.riders[:, t, None]))
+        self.transported[:, s] += delivered.sum(axis=1)
+        self.push(s, self.codeAlight[onboard], alighting)
+        onboard = np.take_along_axis(onboard, np.argsort(~going, axis=1, kind='stable'), axis=1)
+        riders = going.sum(axis=1)
+
+        width = self.lengths[:, s].max(initial=0)
+        waiting = self.queues[:, s, :width]
+        valid = alive & (np.arange(width) < self.lengths[:, s, None])
+        matching = valid & (self.codeLine[waiting] == l)
+        boarding = matching & (np.cumsum(matching, axis=1) <= (self.trainCapacity[t] - riders)[:, None])
+        places = riders[:, None] + np.cumsum(boarding, axis=1) - 1
+        (rows, columns) = np.nonzero(boarding)
+        onboard[rows, places[rows, columns]] = waiting[rows, columns]
+        self.loads[:, t, :] = onboard
+        self.riders[:, t] = riders + boarding.sum(axis=1)
+        staying = (np.arange(width) < self.lengths[:, s, None]) & ~boarding
+        self.queues[:, s, :width] = np.take_along_axis(waiting, np.argsort(~staying, axis=1, kind='stable'), axis=1)
+        self.lengths[:, s] = staying.sum(axis=1)
+
+    def run(self, n):
+
+        '''Runs n ticks, or until every copy has ended, and returns the tick at which each copy ended (-1 if it did not), the largest overload counter of each copy at each tick (ticks x K) and the passengers transported by each station in each copy (K x stations).'''
+
+        while n > 0 and self.alive.any():
+            self.nextState()
+            n -= 1
+        return {'end': self.endTick, 'overload': np.array(self.trace).reshape(-1, self.K), 'transported': self.transported}
+
+    def store(self, r=0):
+
+        '''Writes the state of the copy r into the network.'''
+
+        self.end = bool(self.endTick[r] != -1)
+        self.stored = r
+        self.onboard = [self.loads[r, t, :self.riders[r, t]].tolist() for t in range(len(self.trains))]
+        (overload, transported) = (self.overload, self.transported)
+        (self.overload, self.transported) = (overload[r], transported[r].tolist())
+        ArraySimulation.store(self)
+        (self.overload, self.transported) = (overload, transported)
+
+    def waitingCodes(self, s):
+        return self.queues[self.stored, s, :self.lengths[self.stored, s]].tolist()
+
+
+
+class CountSimulation(ArraySimulation):
+
+    '''A CountSimulation object runs the ticks of ArraySimulation with the passengers counted by code instead of queued, the codes waiting at a station for a line being listed in boardCodes. The order in which they came is lost, so when a train cannot take everybody, its free places are shared between the codes in proportion to their counts, by largest remainders.'''
+
+    def __init__(self, network):
+        ArraySimulation.__init__(self, network)
+        (n, k) = (len(self.spTime), self.k)
+        codes = np.arange(k, len(self.codeShape))
+        station = (codes // k - 1) % max(n, 1)
+        line = np.array(self.codeLine, dtype=np.int64)[codes]
+        queue = (station + n * line)[line != -1]
+        order = np.argsort(queue, kind='stable')
+        (bounds, boarding) = (np.searchsorted(queue[order], np.arange(len(self.queues) + 1)).tolist(), codes[line != -1][order].tolist())
+        self.boardCodes = [boarding[bounds[q]:bounds[q + 1]] for q in range(len(self.queues))]
+        order = np.argsort(station, kind='stable')
+        (bounds, present) = (np.searchsorted(station[order], np.arange(n + 1)).tolist(), codes[order].tolist())
+        self.stationCodes = [present[bounds[s]:bounds[s + 1]] for s in range(n)]
+
+        self.waiting = [0 for _ in self.codeShape]
+        self.lost = np.zeros((n, k), dtype=np.int64)
+        self.pending = [0 for _ in self.queues]
+        self.size = [0 for _ in range(n)]
+        for s in range(n):
+            for c in ArraySimulation.waitingCodes(self, s):
+                self.enqueue(s, c)
+        self.onboard = [self.counts(onboard) for onboard in self.onboard]
+        self.riders = [sum(onboard.values()) for onboard in self.onboard]
+
+    @staticmethod
+    def counts(codes):
+        counts = {}
+        for c in codes:
+            counts[c] = counts.get(c, 0) + 1
+        return counts
+
+    def enqueue(self, s, c, m=1):
+        if c < self.k:
+            self.lost[s, c] += m
+        else:
+            self.waiting[c] += m
+        self.pending[s + self.codeQueue[c]] += m
+        self.size[s] += m
+
+    def share(self, codes, counts, free):
+        total = sum(counts)
+        if len(codes) > self.batch:
+            (shares, remainders) = np.divmod(free * np.array(counts), total)
+            shares[np.lexsort((codes, - remainders))[:free - int(shares.sum())]] += 1
+            return shares.tolist()
+        shares = [free * m // total for m in counts]
+        order = sorted(range(len(codes)), key=lambda j: (- (free * counts[j] % total), codes[j]))
+        for j in order[:free - sum(shares)]:
+            shares[j] += 1
+        return shares
+
+    def arrive(self, t):
+        (l, s) = self.move(t)
+        shape = self.stationShape[s]
+        onboard = self.onboard[t]
+        for c in list(onboard):
+            if self.codeShape[c] == shape:
+                self.transported[s] += onboard[c]
+            elif self.codeStation[c] == s:
+                self.enqueue(s, self.codeAlight[c], onboard[c])
+            else:
+                continue
+            self.riders[t] -= onboard.pop(c)
+
+        free = self.trainCapacity[t] - self.riders[t]
+        q = s + self.n * l
+        total = self.pending[q]
+        if free > 0 and total != 0:
+            (waiting, codes) = (self.waiting, self.boardCodes[q])
+            counts = [waiting[c] for c in codes]
+            if total > free:
+                counts = self.share(codes, counts, free)
+            boarded = min(total, free)
+            self.pending[q] -= boarded
+            self.size[s] -= boarded
+            self.riders[t] += boarded
+            for (c, m) in zip(codes, counts):
+                if m != 0:
+                    waiting[c] -= m
+                    onboard[c] = onboard.get(c, 0) + m
+        self.crowd(s)
+
+    def loadAt(self, t):
+        return self.riders[t]
+
+    def waitingCodes(self, s):
+        waiting = self.waiting
+        return np.repeat(np.arange(self.k), self.lost[s]).tolist() + [c for c in self.stationCodes[s] for _ in range(waiting[c])]
+
+    def store(self):
+        onboard = self.onboard
+        self.onboard = [[c for c in sorted(o) for _ in range(o[c])] for o in onboard]
+        ArraySimulation.store(self)
+        self.onboard = onboard
@@ -1,19 +1,23 @@
 from Structures import *
 from scipy.spatial import Delaunay
+from CSRGraph import CSRGraph
+from scipy.sparse.csgraph import dijkstra as csgraphDijkstra
 from NetworkBuilder import *
 
 
-def dijkstra(graph, statShapes, start, tabShapes):
+def dijkstra(graph, statShapes, start, tabShapes, queue=PriorityQueue):
 
     paths = []
     n = len(graph)
 
     spanningForest = [None for _ in range(n)]
+    durations = np.full(n, float('inf'))
     dejaVu = [False for _ in range(n)]
-    U = PriorityQueue(n)
+    U = queue(n)
     closer = [None for _ in tabShapes]
 
     U.push(start, 0)
+    durations[start] = 0
     
     while U.length() != 0 and len([x for x in closer if x is None]) != 0:
         
@@ -25,10 +29,7 @@ def dijkstra(graph, statShapes, start, tabShapes):
                 if closer[i] is None and statShapes[u] == tabShapes[i]:
                     closer[i] = u
 
-            for (v, w) in graph[u]:
-                if - U.priority(v) > - k + w:
-                    U.changePrio(v, k - w)
-                    spanningForest[v] = u
+            graph.relax(U, u, k, durations, spanningForest)
     
     for i in range(len(tabShapes)):
         route = []
@@ -43,6 +44,36 @@ def dijkstra(graph, statShapes, start, tabShapes):
     return paths
 
 
+def scipyPaths(graph, statShapes, tabShapes):
+
+    '''Same as calling dijkstra from every vertex, with a single call to SciPy's Dijkstra. The routes are rebuilt from the matrix of predecessors.'''
+
+    (durations, predecessors) = csgraphDijkstra(graph.toScipy(), directed=True, return_predecessors=True)
+    predecessors = predecessors.tolist()
+    statShapes = np.asarray(statShapes)
+    goals = []
+
+    for shape in tabShapes:
+        candidates = np.flatnonzero(statShapes == shape)
+        closer = candidates[np.argmin(durations[:, candidates], axis=1)]
+        reached = np.isfinite(durations[np.arange(len(graph)), closer])
+        goals.append(np.where(reached, closer, -1).tolist())
+
+    allPaths = []
+    for start in range(len(graph)):
+        paths = []
+        for i in range(len(tabShapes)):
+            route = []
+            goal = goals[i][start]
+            while goal != -1 and goal != start:
+                route.append(goal)
+                goal = predecessors[start][goal]
+            paths.append(route)
+        allPaths.append(paths)
+
+    return allPaths
+
+
 def buildFlowRoute(graph, start, shapeNb, flowGraph, route, influx):
     current = start
 
@@ -52,11 +83,16 @@ def buildFlowRoute(graph, start, shapeNb, flowGraph, route, influx):
         current = dest
 
 
-def buildFlowGraph(graph, statShapes, influx, tabShapes):
-    flowGraph = [[0 for _ in graph] for _ in graph]
+def buildFlowGraph(graph, statShapes, influx, tabShapes, queue=PriorityQueue, backend='python'):
+    flowGraph = [[0 for _ in range(len(graph))] for _ in range(len(graph))]
+    if backend == 'scipy':
+        allPaths = scipyPaths(graph, statShapes, tabShapes)
 
     for vertex in range(len(graph)):
-        paths = dijkstra(graph, statShapes, vertex, tabShapes)
+        if backend == 'scipy':
+            paths = allPaths[vertex]
+        else:
+            paths = dijkstra(graph, statShapes, vertex, tabShapes, queue)
         for i in range(len(tabShapes)):
             buildFlowRoute(graph, vertex, i, flowGraph, paths[i], influx)
     
@@ -83,16 +119,12 @@ def initialGraph(network):
         insert(graph, i, k, network.distances[i][k])
         insert(graph, j, k, network.distances[j][k])
     
-    return graph
+    return CSRGraph.fromLists(graph)
 
 
 def removeUseless(graph, flowGraph):
-    for i in range(len(graph)):
-        useful = []
-        for (j, w) in graph[i]:
-            if flowGraph[i][j] > 0.01:
-                useful.append((j,w))
-        graph[i] = useful
+    flow = np.asarray(flowGraph)
+    graph.restrict(flow[graph.tails(), graph.indices] > 0.01)
 
 
 def selectFirst(flowGraph):
@@ -148,7 +180,7 @@ def exhaustEdges(network, selectBranch):
     graph = initialGraph(network)
     influx = [[x[1] / station.spTime for x in station.spRate] for station in network.stations]
     statShapes = [station.shape for station in network.stations]
-    flowGraph = buildFlowGraph(graph, statShapes, influx, network.shapes)
+    flowGraph = buildFlowGraph(graph, statShapes, influx, network.shapes, network.queue, network.backend)
     trainNumber = 0
 
     while sum([sum(x) for x in flowGraph]) > 0.01:  #Float
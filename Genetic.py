@@ -1,6 +1,7 @@
 from Structures import *
-from copy import deepcopy
 from Flow import *
+from SpawnSchedule import SpawnSchedule, commonSpawns
+from scipy.special import ndtr
 
 
     ## Evaluation
@@ -31,6 +32,104 @@ def meanWaitingTime(network):
     return mean
 
 
+def compareNetworks(networks, ticks, runs=8, seed=0, common=True):
+
+    '''Runs a copy of each network runs times for ticks ticks and compares them with the first one, the run r of every network seeing the same spawns (commonSpawns with the seed seed + r) if common is True. Gives the ticks survived and the passengers transported (networks x runs), their means, and the means and standard errors of the differences with the first network.'''
+
+    values = {'tick': np.zeros((len(networks), runs)), 'transported': np.zeros((len(networks), runs))}
+    for r in range(runs):
+        copies = [network.copy() for network in networks]
+        if common:
+            commonSpawns(copies, seed + r)
+        else:
+            for (i, copy) in enumerate(copies):
+                copy.spawns = SpawnSchedule(copy, seed + r * len(networks) + i)
+        for (i, copy) in enumerate(copies):
+            start = copy.tick
+            copy.oneEternityLater(ticks)
+            values['tick'][i, r] = copy.tick - start
+            values['transported'][i, r] = sum([station.transported for station in copy.stations]) - sum([station.transported for station in networks[i].stations])
+
+    result = {}
+    for (name, v) in values.items():
+        difference = v - v[0]
+        result[name] = {'values': v, 'mean': v.mean(axis=1), 'difference': difference.mean(axis=1), 'stderr': difference.std(axis=1, ddof=1) / np.sqrt(runs) if runs > 1 else np.full(len(networks), np.inf)}
+    return result
+
+
+def raceNetworks(networks, horizon, ticks=None, keep=0.5, runs=1, seed=0, common=True):
+
+    '''Ranks networks by the passengers they transport in horizon ticks with successive halving: every round keeps the best fraction keep and doubles the ticks and the runs of the survivors, until the horizon or a single network is left. full is the cost of running every network runs times to the horizon.'''
+
+    ticks = max(1, horizon // 16) if ticks is None else min(ticks, horizon)
+    asked = runs
+    alive = list(range(len(networks)))
+    copies = [[] for _ in networks]
+    base = [sum([station.transported for station in network.stations]) for network in networks]
+    (mean, stderr, survived, reached, counts, confidence) = [np.zeros(len(networks)) for _ in range(6)]
+    (rounds, dropped, spent, last) = ([], [], 0, [0 for _ in networks])
+
+    while True:
+        for r in range(len(copies[alive[0]]), runs):
+            fresh = [networks[i].copy() for i in alive]
+            if common:
+                commonSpawns(fresh, seed + r)
+            else:
+                for (i, copy) in zip(alive, fresh):
+                    copy.spawns = SpawnSchedule(copy, seed + r * len(networks) + i)
+            for (i, copy) in zip(alive, fresh):
+                copies[i].append((copy, copy.tick))
+        scores = np.zeros((len(alive), runs))
+        for (j, i) in enumerate(alive):
+            for (r, (copy, start)) in enumerate(copies[i]):
+                before = copy.tick
+                if not copy.end and copy.tick - start < ticks:
+                    copy.oneEternityLater(ticks - (copy.tick - start))
+                spent += copy.tick - before
+                scores[j, r] = sum([station.transported for station in copy.stations]) - base[i]
+            survived[i] = np.mean([copy.tick - start for (copy, start) in copies[i]])
+        mean[alive] = scores.mean(axis=1)
+        stderr[alive] = scores.std(axis=1, ddof=1) / np.sqrt(runs) if runs > 1 else np.inf
+        reached[alive] = ticks
+        counts[alive] = runs
+        rounds.append({'ticks': ticks, 'runs': runs, 'networks': list(alive), 'scores': scores})
+        for (j, i) in enumerate(alive):
+            last[i] = (len(rounds) - 1, j)
+
+        order = np.argsort(-scores.mean(axis=1), kind='stable')
+        if ticks >= horizon or len(alive) == 1:
+            break
+        kept = max(1, int(np.ceil(keep * len(alive))))
+        dropped = [alive[j] for j in order[kept:]] + dropped
+        for j in order[kept:]:
+            copies[alive[j]] = []
+        alive = [alive[j] for j in order[:kept]]
+        if len(alive) == 1:
+            order = [0]
+            break
+        ticks = min(2 * ticks, horizon)
+        runs *= 2
+
+    ranking = [alive[j] for j in order] + dropped
+    for (i, j) in zip(ranking, ranking[1:]):
+        (k, below) = last[j]
+        above = rounds[k]['networks'].index(i)
+        confidence[i] = pairedConfidence(rounds[k]['scores'][above] - rounds[k]['scores'][below])
+    confidence[ranking[-1]] = np.nan
+    full = len(networks) * horizon * asked
+    return {'ranking': ranking, 'mean': mean, 'stderr': stderr, 'runs': counts, 'survived': survived, 'horizon': reached, 'confidence': confidence,
+            'rounds': rounds, 'spent': spent, 'full': full, 'saved': 1 - spent / full}
+
+
+def pairedConfidence(difference):
+    if len(difference) < 2:
+        return np.nan
+    stderr = difference.std(ddof=1) / np.sqrt(len(difference))
+    if stderr == 0:
+        return 0.5 if difference.mean() == 0 else float(difference.mean() > 0)
+    return float(ndtr(difference.mean() / stderr))
+
+
     ## Mutations
 
 def insertStation(network, line):
@@ -176,7 +275,7 @@ def OPT2(network, lineNb):
 
         while j < len(bestRoute):
             newR = swap(bestRoute, i, j)
-            newNet = deepcopy(bestNetwork)
+            newNet = bestNetwork.copy()
             newNet.lines[lineNb].route = newR
             newNet.updateAllPaths()
             newWeight = globalWaitingTime(newNet)
@@ -218,7 +317,7 @@ def mutate(network):
     ## Main algorithm
 
 def startSample(network, n):
-    population = [deepcopy(network) for _ in range(n)]
+    population = [network.copy() for _ in range(n)]
     for indiv in population:
         for _ in range(10):
             mutate(indiv)
@@ -227,14 +326,14 @@ def startSample(network, n):
 
 def geneticMaybe(network):
     population = startSample(network, 10)
-    nextGen = deepcopy(population)
+    nextGen = [indiv.copy() for indiv in population]
     for i in range(100):
         print(str(i) + '%')
         if len(population) <= 3:
-            population += deepcopy(population)
-            population += deepcopy(population)
+            population += [indiv.copy() for indiv in population]
+            population += [indiv.copy() for indiv in population]
         for indiv in population:
-            new = deepcopy(indiv)
+            new = indiv.copy()
             mutate(new)
             if len(new.lines) > 0:
                 nextGen.append(new)
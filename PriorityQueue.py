@@ -1,3 +1,4 @@
+from heapq import heappush, heappop
 
 
 class PriorityQueue:
@@ -30,14 +31,16 @@ class PriorityQueue:
         n = self.length()
         self.index[x] = n
         self.priorities[x] = key
-
+        self.climb(n)
+        
+    def climb(self, n):
         while n > 1 and self.prio(n // 2) < self.prio(n):
             self.swap(n, n // 2)
             n = n // 2
-        
+
     def percolate(self, i):
         k = i
-        if 2 * i + 1 < self.length():
+        if 2 * i + 1 <= self.length():
             if self.prio(2 * i) > self.prio(i):
                 if self.prio(2 * i + 1) > self.prio(i):
                     if self.prio(2 * i) < self.prio(2 * i + 1):
@@ -48,7 +51,7 @@ class PriorityQueue:
                     k = 2 * i
             elif self.prio(2 * i + 1) > self.prio(i):
                     k = 2 * i + 1
-        elif 2 * i < self.length():
+        elif 2 * i <= self.length():
             if self.prio(2 * i) > self.prio(i):
                 k = 2 * i
         if k != i:
@@ -69,13 +72,186 @@ class PriorityQueue:
             self.push(u, newKey)
         else:
             self.priorities[u] = newKey
+            self.climb(self.index[u])
             self.percolate(self.index[u])
-    
-    
 
 
 
-                    
+class DaryHeap:
 
-        
+    '''Implements the same bounded capacity queue as PriorityQueue with a d-ary heap kept in flat lists, where the items are moved by iterative sifts (a hole is moved and the item written once) and changePrio is a real decrease-key. reset empties the queue by only cleaning the items used since the last reset, so the same heap can serve many searches without allocating its lists again. '''
+
+    def __init__(self, size=5, d=4):
+        self.d = d
+        self.heap = []
+        self.index = [-1 for _ in range(size)]
+        self.priorities = [- float('inf') for _ in range(size)]
+        self.touched = []
+
+    def reset(self, size):
+        for u in self.touched:
+            self.index[u] = -1
+            self.priorities[u] = - float('inf')
+        if size > len(self.index):
+            self.index += [-1 for _ in range(size - len(self.index))]
+            self.priorities += [- float('inf') for _ in range(size - len(self.priorities))]
+        self.heap.clear()
+        self.touched.clear()
+
+    def length(self):
+        return len(self.heap)
+
+    def priority(self, u):
+        return self.priorities[u]
+
+    def push(self, x, key):
+        self.priorities[x] = key
+        self.touched.append(x)
+        self.heap.append(x)
+        self.climb(len(self.heap) - 1)
+
+    def climb(self, i):
+        (heap, index, priorities, d) = (self.heap, self.index, self.priorities, self.d)
+        x = heap[i]
+        key = priorities[x]
+        while i > 0:
+            parent = (i - 1) // d
+            y = heap[parent]
+            if priorities[y] >= key:
+                break
+            heap[i] = y
+            index[y] = i
+            i = parent
+        heap[i] = x
+        index[x] = i
+
+    def percolate(self, i):
+        (heap, index, priorities, d) = (self.heap, self.index, self.priorities, self.d)
+        n = len(heap)
+        x = heap[i]
+        key = priorities[x]
+        while True:
+            first = d * i + 1
+            if first >= n:
+                break
+            best = first
+            bestKey = priorities[heap[first]]
+            for c in range(first + 1, min(first + d, n)):
+                if priorities[heap[c]] > bestKey:
+                    best = c
+                    bestKey = priorities[heap[c]]
+            if bestKey <= key:
+                break
+            heap[i] = heap[best]
+            index[heap[i]] = i
+            i = best
+        heap[i] = x
+        index[x] = i
+
+    def pop(self):
+        heap = self.heap
+        u = heap[0]
+        last = heap.pop()
+        if len(heap) != 0:
+            heap[0] = last
+            self.percolate(0)
+        self.index[u] = -1
+        return u, self.priorities[u]
+
+    def changePrio(self, u, newKey):
+        if self.index[u] == -1:
+            self.push(u, newKey)
+        elif newKey > self.priorities[u]:
+            self.priorities[u] = newKey
+            self.climb(self.index[u])
+        else:
+            self.priorities[u] = newKey
+            self.percolate(self.index[u])
+
+
+def daryHeap(d=4):
+
+    '''Returns a queue for Network that builds a single DaryHeap and resets it at the start of every search. The searches using it must not overlap.'''
+
+    heaps = []
+
+    def queue(size):
+        if len(heaps) == 0:
+            heaps.append(DaryHeap(size, d))
+        else:
+            heaps[0].reset(size)
+        return heaps[0]
+
+    return queue
+
+
+class BucketQueue:
+
+    '''Implements the same bounded capacity queue as PriorityQueue with Dial's algorithm: the items are kept in a circular array of buckets, one per multiple of resolution, read by a cursor that only moves back when a smaller key is pushed. The graph must have its weights rounded to resolution (see CSRGraph.rounded), which keeps each duration within resolution / 2 per edge of the exact one.'''
+
+    def __init__(self, size=5, resolution=1, span=64):
+        self.resolution = resolution
+        self.index = [None for _ in range(size)]
+        self.priorities = [- float('inf') for _ in range(size)]
+        self.buckets = [[] for _ in range(span)]
+        self.cursor = 0
+        self.last = 0
+        self.size = 0
+
+    def length(self):
+        return self.size
+
+    def priority(self, u):
+        return self.priorities[u]
+
+    def grow(self, low, high):
+        span = len(self.buckets)
+        while span <= high - low:
+            span *= 2
+        buckets = [[] for _ in range(span)]
+        for b in range(self.cursor, self.last + 1):
+            buckets[b % span] = self.buckets[b % len(self.buckets)]
+        self.buckets = buckets
+
+    def push(self, x, key):
+        b = int(round(- key / self.resolution))
+        if self.size == 0:
+            (self.cursor, self.last) = (b, b)
+        elif b < self.cursor or b > self.last:
+            (low, high) = (min(b, self.cursor), max(b, self.last))
+            if high - low >= len(self.buckets):
+                self.grow(low, high)
+            (self.cursor, self.last) = (low, high)
+        self.buckets[b % len(self.buckets)].append(x)
+        if self.index[x] is None:
+            self.size += 1
+        self.index[x] = b
+        self.priorities[x] = - b * self.resolution
+
+    def pop(self):
+        (buckets, index) = (self.buckets, self.index)
+        span = len(buckets)
+        while True:
+            b = self.cursor
+            bucket = buckets[b % span]
+            while len(bucket) != 0:
+                u = bucket.pop()
+                if index[u] == b:
+                    index[u] = None
+                    self.size -= 1
+                    return u, self.priorities[u]
+            self.cursor += 1
+
+    def changePrio(self, u, newKey):
+        self.push(u, newKey)
+
+
+def bucketQueue(resolution=1):
+
+    '''Returns a queue for Network that builds a BucketQueue for every search. Network rounds the weights of its graph to resolution when it builds it.'''
+
+    def queue(size):
+        return BucketQueue(size, resolution)
 
+    queue.resolution = resolution
+    return queue
@@ -0,0 +1,80 @@
+import json
+from time import perf_counter
+
+
+
+class TickProfiler:
+
+    '''A TickProfiler object times the phases of the ticks of a network once it is set as network.profiler: spawn, upCrowded, move, empty and fill with the objects engine, with their calls and the passengers they handle, and only the building, run and store of the simulation with the other engines. results gives the totals as a dict and json as a JSON string.'''
+
+    phases = ['spawn', 'upCrowded', 'move', 'empty', 'fill', 'build', 'run', 'store']
+
+    def __init__(self):
+        self.reset()
+
+    def reset(self):
+        self.seconds = {phase: 0.0 for phase in self.phases}
+        self.calls = {phase: 0 for phase in self.phases}
+        self.items = {'spawned': 0, 'alighted': 0, 'delivered': 0, 'transferred': 0, 'boarded': 0, 'ticks': 0}
+
+    def nextState(self, network):
+        (seconds, calls, items) = (self.seconds, self.calls, self.items)
+        items['ticks'] += 1
+        for station in network.stations:
+            waiting = station.nbWaiting
+            start = perf_counter()
+            station.spawn(network)
+            middle = perf_counter()
+            station.upCrowded(network)
+            end = perf_counter()
+            seconds['spawn'] += middle - start
+            seconds['upCrowded'] += end - middle
+            items['spawned'] += station.nbWaiting - waiting
+        calls['spawn'] += len(network.stations)
+        calls['upCrowded'] += len(network.stations)
+
+        for line in network.lines:
+            for train in line.trains:
+                if train.nextTime != 0:
+                    train.nextTime -= 1
+                    continue
+                start = perf_counter()
+                station = line.move(train, network.distances, network.stations)
+                (onboard, waiting, transported) = (len(train.passengers), station.nbWaiting, station.transported)
+                moved = perf_counter()
+                train.empty(station)
+                emptied = perf_counter()
+                (left, transferred) = (len(train.passengers), station.nbWaiting - waiting)
+                train.fill(station)
+                end = perf_counter()
+                seconds['move'] += moved - start
+                seconds['empty'] += emptied - moved
+                seconds['fill'] += end - emptied
+                calls['move'] += 1
+                calls['empty'] += 1
+                calls['fill'] += 1
+                items['alighted'] += onboard - left
+                items['delivered'] += station.transported - transported
+                items['transferred'] += transferred
+                items['boarded'] += len(train.passengers) - left
+
+    def oneEternityLater(self, network, n):
+        start = perf_counter()
+        simulation = network.simulation()
+        built = perf_counter()
+        simulation.run(n)
+        ran = perf_counter()
+        simulation.store()
+        end = perf_counter()
+        network.tick += simulation.tick
+        for (phase, elapsed) in (('build', built - start), ('run', ran - built), ('store', end - ran)):
+            self.seconds[phase] += elapsed
+            self.calls[phase] += 1
+        self.items['ticks'] += simulation.tick
+        return network.end
+
+    def results(self):
+        return {'phases': {phase: {'seconds': self.seconds[phase], 'calls': self.calls[phase]} for phase in self.phases if self.calls[phase] != 0}, 'items': dict(self.items)}
+
+    def json(self, **kwargs):
+        return json.dumps(self.results(), **kwargs)
@@ -0,0 +1,152 @@
+import numpy as np
+from scipy.special import ndtr
+
+
+
+def queueingEstimate(network):
+
+    '''Estimates the load of a network from its PathTable without simulating it: the passengers follow their paths at their spawn rates, each stop of a line is a queue served by the places its trains bring per cycle, and the waiting passengers of a station follow a normal law whose odds of exceeding the capacity give the risk of overload. Returns a dict with, for every station, its arrival rate, utilisation, expected number of waiting passengers and risk of overload, and for every line its utilisation.'''
+
+    stations = network.stations
+    (n, p, k) = (len(stations), len(network.lines), len(network.shapes))
+    if p != 0 and network.table is None:
+        raise ValueError('the network has no paths yet: call updateAllPaths first')
+    arrival = np.zeros((n, k))
+    for s in range(n):
+        arrival[s, :len(stations[s].spRate)] = [ratio for (_, ratio) in stations[s].spRate][:k]
+    arrival /= np.array([station.spTime + 1 for station in stations], dtype=np.float64)[:, None]
+    capacity = np.array([station.capacity for station in stations], dtype=np.float64)
+
+    routes = [list(line.route) for line in network.lines]
+    lengths = np.array([len(route) for route in routes], dtype=np.int64)
+    offsets = np.cumsum(lengths) - lengths
+    stopStation = np.array([s for route in routes for s in route], dtype=np.int64)
+    stopLine = np.repeat(np.arange(p), lengths)
+    stopPosition = np.arange(len(stopStation)) - offsets[stopLine]
+    cyclic = np.array([line.cyclic for line in network.lines], dtype=np.bool_)
+    distances = np.asarray(network.distances, dtype=np.float64)
+    following = np.where(stopPosition + 1 < lengths[stopLine], np.arange(len(stopStation)) + 1, offsets[stopLine])
+    legs = distances[stopStation, stopStation[following]] + 1 if len(stopStation) != 0 else np.zeros(0)
+    last = stopPosition == lengths[stopLine] - 1
+    period = np.bincount(stopLine, weights=np.where(last & ~cyclic[stopLine], 0, legs), minlength=p) * np.where(cyclic, 1, 2)
+    trains = np.array([len(line.trains) for line in network.lines], dtype=np.float64)
+    lineCapacity = np.array([sum([train.capacity for train in line.trains]) for line in network.lines], dtype=np.float64)
+    serving = (lengths >= 2) & (trains > 0) & (period > 0)
+    rate = np.where(serving, lineCapacity / np.where(serving, period, 1), 0)
+
+    first = stopPosition == 0
+    middle = ~cyclic[stopLine] & ~first & ~last
+    prefix = np.cumsum(legs) - legs
+    prefix -= prefix[offsets[stopLine]] if len(prefix) != 0 else 0
+    ahead = np.where(middle, 2 * prefix, period[stopLine])
+    behind = np.where(middle, period[stopLine] - 2 * prefix, 0)
+    forwardShare = np.where(middle, ahead / np.where(middle, period[stopLine], 1), np.where(last & ~cyclic[stopLine], 0, 1))
+
+    position = np.full((p, n), -1, dtype=np.int64)
+    position[stopLine[::-1], stopStation[::-1]] = stopPosition[::-1]
+    stopShape = np.array([stations[s].shape for s in stopStation.tolist()])
+    index = np.arange(len(stopStation))
+
+    unserved = np.zeros(n)
+    rides = []
+    for i in range(k if p != 0 else 0):
+        start = np.asarray(network.table.starts[i])
+        hop = np.asarray(network.table.hops[i])
+        unserved += np.where(start == -1, arrival[:, i], 0)
+
+        mark = stopShape == network.shapes[i]
+        below = np.maximum.accumulate(np.where(mark, index, -1)) if len(index) != 0 else index
+        below = np.append(-1, below[:-1]) - offsets[stopLine] if len(index) != 0 else index
+        above = np.minimum.accumulate(np.where(mark, index, len(index))[::-1])[::-1] if len(index) != 0 else index
+        above = np.append(above[1:], len(index)) - offsets[stopLine] if len(index) != 0 else index
+        moving = np.flatnonzero(hop != -1)
+        line = hop[moving] // n
+        (a, b) = (position[line, moving % n], position[line, hop[moving] % n])
+        (line, a, b, moving) = (line[(a != -1) & (b != -1)], a[(a != -1) & (b != -1)], b[(a != -1) & (b != -1)], moving[(a != -1) & (b != -1)])
+        stop = offsets[line] + a
+        detour = np.where(cyclic[line], -1, np.where(b > a, np.maximum(below[stop], -1), np.minimum(above[stop], lengths[line])))
+        wrong = np.where(cyclic[line], 0, np.where(b > a, 1 - forwardShare[stop], forwardShare[stop]))
+        delivered = np.where(b > a, detour >= 0, detour < lengths[line])
+        going = np.ones(n * p)
+        going[moving] = 1 - np.where(delivered & ~cyclic[line], wrong, 0)
+        going[hop == -1] = 0
+
+        flow = np.bincount(start[start != -1], weights=arrival[start != -1, i], minlength=n * p).astype(np.float64)
+        total = np.zeros(n * p)
+        while flow.any():
+            total += flow
+            flow = np.bincount(hop[going > 0], weights=(flow * going)[going > 0], minlength=n * p).astype(np.float64)
+        rides.append((line, a, b, total[moving], wrong, np.where(delivered, detour, -2)))
+
+    boardForward = np.zeros(len(stopStation))
+    boardBackward = np.zeros(len(stopStation))
+    forward = np.zeros(len(stopStation) + p)
+    backward = np.zeros(len(stopStation) + p)
+    if len(rides) != 0:
+        (line, a, b, rideRate, wrong, detour) = [np.concatenate(column) for column in zip(*rides)]
+        (slot, end, zero) = (offsets[line] + line, lengths[line] - 1, np.zeros(len(a), dtype=np.int64))
+        (loop, up, down) = (cyclic[line], ~cyclic[line] & (b > a), ~cyclic[line] & (b < a))
+        (early, late) = (detour != -2, detour == -2)
+        wrong = rideRate * wrong
+        onward = rideRate - wrong
+
+        def add(loads, mask, low, high, rates):
+            np.add.at(loads, slot[mask] + low[mask], rates[mask])
+            np.add.at(loads, slot[mask] + high[mask], -rates[mask])
+
+        add(forward, loop & (b > a), a, b, rideRate)
+        add(forward, loop & (b < a), a, end + 1, rideRate)
+        add(forward, loop & (b < a), zero, b, rideRate)
+        add(forward, up, a, b, onward)
+        add(backward, up & early, detour, a, wrong)
+        add(backward, up & late, zero, a, wrong)
+        add(forward, up & late, zero, b, wrong)
+        add(backward, down, b, a, onward)
+        add(forward, down & early, a, detour, wrong)
+        add(forward, down & late, a, end, wrong)
+        add(backward, down & late, b, end, wrong)
+        np.add.at(boardForward, offsets[line] + a, np.where(up | loop, onward, wrong))
+        np.add.at(boardBackward, offsets[line] + a, np.where(up | loop, wrong, onward))
+    kept = np.ones(len(stopStation) + p, dtype=np.bool_)
+    kept[offsets + np.arange(p) + lengths] = False
+    forwardLoad = np.cumsum(forward)[kept]
+    backwardLoad = np.cumsum(backward)[kept]
+
+    stopRate = rate[stopLine]
+    previous = np.maximum(np.arange(len(stopStation)) - 1, 0)
+    goesForward = cyclic[stopLine] | ~last
+    goesBackward = ~cyclic[stopLine] & ~first
+    service = np.where(goesForward, stopRate - (forwardLoad - boardForward), 0) + np.where(goesBackward, stopRate - (backwardLoad[previous] - boardBackward), 0)
+    boarding = boardForward + boardBackward
+    with np.errstate(divide='ignore', invalid='ignore'):
+        stopUtilisation = np.where(boarding > 0, np.where(service > 0, boarding / service, np.inf), 0)
+        (cycle, fleet) = (period[stopLine], trains[stopLine])
+        wait = np.where(serving[stopLine], (ahead ** 2 + behind ** 2) / (2 * cycle * fleet), np.inf)
+        second = np.where(serving[stopLine], (ahead ** 3 + behind ** 3) / (3 * cycle * fleet ** 2), np.inf)
+        stopQueue = np.where(boarding > 0, np.where(stopUtilisation < 1, boarding * wait / (1 - stopUtilisation), np.inf), 0)
+        sawtooth = np.where(boarding > 0, boarding ** 2 * (second - wait ** 2), 0)
+        segments = np.concatenate([forwardLoad, backwardLoad]) / np.concatenate([stopRate, stopRate])
+
+    utilisation = np.where(unserved > 0, np.inf, 0)
+    np.maximum.at(utilisation, stopStation, stopUtilisation)
+    queue = np.where(unserved > 0, np.inf, 0) + np.bincount(stopStation, weights=stopQueue, minlength=n)
+    variance = np.bincount(stopStation, weights=sawtooth, minlength=n)
+    lineUtilisation = np.zeros(p)
+    np.maximum.at(lineUtilisation, np.concatenate([stopLine, stopLine]), np.nan_to_num(segments, nan=0, posinf=np.inf))
+    with np.errstate(invalid='ignore'):
+        risk = np.where(np.isfinite(queue), ndtr((queue - capacity) / np.sqrt(queue + variance + 1e-12)), 1)
+    risk = np.where(np.isinf(capacity), 0, risk)
+
+    return {'arrival': arrival.sum(axis=1), 'utilisation': utilisation, 'queue': queue, 'risk': risk, 'lineUtilisation': lineUtilisation}
+
+
+def screen(networks, low=0.05, high=0.95, margin=0.25):
+
+    '''Sorts networks with queueingEstimate: the ones whose riskiest station has a risk of overload below low are kept and the ones above high are dropped, unless the utilisation of their busiest station is within margin of 1, where the estimate is the least reliable. The others are borderline and worth simulating. Returns the indexes of the networks kept, borderline and dropped, and the highest risk of each network.'''
+
+    estimates = [queueingEstimate(network) for network in networks]
+    risks = np.array([estimate['risk'].max(initial=0) for estimate in estimates])
+    close = np.array([abs(estimate['utilisation'].max(initial=0) - 1) <= margin for estimate in estimates], dtype=np.bool_)
+    kept = (risks < low) & ~close
+    dropped = (risks > high) & ~close
+    return np.flatnonzero(kept).tolist(), np.flatnonzero(~kept & ~dropped).tolist(), np.flatnonzero(dropped).tolist(), risks
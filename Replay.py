@@ -0,0 +1,125 @@
+import numpy as np
+import matplotlib.pyplot as plt
+from matplotlib.animation import FuncAnimation
+from TraceRecorder import Trace
+from Structures import Network, Station, Line
+
+
+
+class Replay:
+
+    '''A Replay object shows a run recorded by a TraceRecorder without simulating it again: the passengers waiting at each station as a disc sized by their number and colored by the overload counter, and the trains between their stops, sized by their load. seek and forward move through the frames, read one at a time, and play animates them: space pauses, the arrows seek or change the speed, home and end go to the first and last frames.'''
+
+    def __init__(self, directory, skip=1):
+        self.trace = Trace(directory)
+        meta = self.trace.meta
+        if any([station['loc'] is None for station in meta['stations']]):
+            raise ValueError('the replay needs the locations of the stations')
+        self.locs = np.array([station['loc'] for station in meta['stations']], dtype=np.float64).reshape(-1, 2)
+        self.lines = meta['lines']
+        trainLines = np.array(meta['trainLines'], dtype=np.int64)
+        lengths = np.array([len(line['route']) for line in self.lines], dtype=np.int64)
+        self.route = np.array([s for line in self.lines for s in line['route']], dtype=np.int64)
+        self.legs = np.array([leg for line in self.lines for leg in line['legs']], dtype=np.float64)
+        self.trainLines = trainLines
+        self.network = self.layout(meta)
+        self.offsets = (np.cumsum(lengths) - lengths)[trainLines]
+        self.lengths = lengths[trainLines]
+        self.position = 0
+        self.skip = skip
+        self.paused = False
+        self.figure = None
+
+    def layout(self, meta):
+        stations = [Station(s, station['shape'], [], [], [], tuple(station['loc']), capacity=station['capacity']) for (s, station) in enumerate(meta['stations'])]
+        distances = np.zeros((len(stations), len(stations)))
+        for line in meta['lines']:
+            route = line['route']
+            for k in range(len(route)):
+                distances[route[k], route[(k + 1) % len(route)]] = line['legs'][k]
+        lines = [Line(l, list(line['route']), [], line['cyclic']) for (l, line) in enumerate(meta['lines'])]
+        return Network(stations, distances.tolist(), lines, sorted(set([station.shape for station in stations])))
+
+    def __len__(self):
+        return len(self.trace)
+
+    def seek(self, i):
+        self.position = max(min(i, len(self.trace) - 1), 0)
+        return self.position
+
+    def forward(self, frames=None):
+        return self.seek(self.position + (self.skip if frames is None else frames))
+
+    def trainLocations(self, frame):
+        nextDest = frame['nextDest'].astype(np.int64)
+        direct = frame['direct']
+        previous = np.where(direct, nextDest - 1, nextDest + 1) % np.maximum(self.lengths, 1)
+        leg = self.legs[self.offsets + np.where(direct, previous, nextDest)] if len(self.legs) != 0 else np.zeros(0)
+        progress = np.clip(1 - frame['nextTime'] / np.where(leg > 0, leg, 1), 0, 1)
+        start = self.locs[self.route[self.offsets + previous]]
+        end = self.locs[self.route[self.offsets + nextDest]]
+        return start + (end - start) * progress[:, None]
+
+    def draw(self, axes=None):
+        if axes is None:
+            (_, axes) = plt.subplots()
+        self.figure = axes.figure
+        self.axes = axes
+
+        colors = self.network.plot(False, axes)
+        self.crowds = axes.scatter(self.locs[:, 0], self.locs[:, 1], s=np.zeros(len(self.locs)), c=np.zeros(len(self.locs)), cmap='Reds', vmin=0, vmax=100, alpha=0.5, zorder=0.5)
+        self.trains = axes.scatter(np.zeros(len(self.trainLines)), np.zeros(len(self.trainLines)), s=40, c=[colors[l] for l in self.trainLines], edgecolors='black', zorder=4)
+        return self.show()
+
+    def show(self, i=None):
+        if i is not None:
+            self.seek(i)
+        if self.figure is None:
+            return self.draw()
+        frame = self.trace.frame(self.position)
+        self.crowds.set_sizes(np.minimum(16 * frame['waiting'], 1600))
+        self.crowds.set_array(frame['overload'])
+        self.trains.set_offsets(self.trainLocations(frame))
+        self.trains.set_sizes(40 + 8 * frame['load'])
+        self.axes.set_title('tick ' + str(frame['tick']) + ', transported ' + str(int(frame['transported'].sum())) + (', end' if frame['end'] else ''))
+        return self.crowds, self.trains
+
+    def key(self, event):
+        if event.key == ' ':
+            self.paused = not self.paused
+        elif event.key in ('left', 'right'):
+            self.forward((10 if event.key == 'right' else -10) * self.skip)
+        elif event.key == 'up':
+            self.skip *= 2
+        elif event.key == 'down':
+            self.skip = max(self.skip // 2, 1)
+        elif event.key == 'home':
+            self.seek(0)
+        elif event.key == 'end':
+            self.seek(len(self.trace) - 1)
+
+    def play(self, start=0, stop=None, skip=None, interval=40, show=True):
+        if skip is not None:
+            self.skip = skip
+        last = len(self.trace) - 1 if stop is None else min(stop, len(self.trace)) - 1
+        self.seek(start)
+        self.paused = False
+        if self.figure is None:
+            self.draw()
+        self.figure.canvas.mpl_connect('key_press_event', self.key)
+
+        def frames():
+            shown = None
+            while True:
+                if shown == self.position and not self.paused:
+                    if self.position >= last:
+                        self.paused = True
+                    else:
+                        self.seek(min(self.position + self.skip, last))
+                shown = self.position
+                yield shown
+
+        self.animation = FuncAnimation(self.figure, lambda i: self.show(), frames=frames, interval=interval, cache_frame_data=False)
+        if show:
+            plt.show()
+        return self.animation
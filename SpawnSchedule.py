@@ -0,0 +1,55 @@
+import numpy as np
+from copy import copy, deepcopy
+
+
+
+class SpawnSchedule:
+
+    '''A SpawnSchedule object draws the passengers spawned by the stations of a network ahead of time, chunk spawns at a time, from one generator per station spawned from the same seed, so that the spawns of a station do not depend on the order in which the stations are simulated. draw(s) gives the shape number of the next spawn of s (-1 when nobody comes), copy a schedule that goes on with the same spawns, and commonSpawns gives the same spawns to several networks.'''
+
+    def __init__(self, network, seed=None, chunk=4096):
+        stations = network.stations
+        self.chunk = chunk
+        self.bounds = [np.cumsum([ratio for (_, ratio) in station.spRate]) for station in stations]
+        self.generators = [np.random.default_rng(child) for child in np.random.SeedSequence(seed).spawn(len(stations))]
+        self.drawn = [0 for _ in stations]
+        self.pending = [[] for _ in stations]
+        self.position = [0 for _ in stations]
+        for s in range(len(stations)):
+            self.refill(s)
+
+    def refill(self, s):
+        r = self.generators[s].random(self.chunk)
+        shapes = np.searchsorted(self.bounds[s], r, side='right')
+        shapes[shapes == len(self.bounds[s])] = -1
+        self.pending[s] = shapes.tolist()
+        self.drawn[s] += self.chunk
+        self.position[s] = 0
+
+    def draw(self, s):
+        if self.position[s] == self.chunk:
+            self.refill(s)
+        self.position[s] += 1
+        return self.pending[s][self.position[s] - 1]
+
+    def copy(self):
+        schedule = copy(self)
+        schedule.generators = [deepcopy(generator) for generator in self.generators]
+        for name in ('drawn', 'pending', 'position'):
+            setattr(schedule, name, list(getattr(self, name)))
+        return schedule
+
+
+
+def commonSpawns(networks, seed=None, chunk=4096):
+
+    '''Gives all the networks the same spawns, for common random numbers: one SpawnSchedule is drawn for the first network and every network gets its own copy, so they see the same passengers at the same ticks at every station and only differ by their lines. The networks must have the same stations, with the same spawn times, timers and rates.'''
+
+    stations = [(station.spTime, station.time, station.spRate) for station in networks[0].stations]
+    for network in networks[1:]:
+        if [(station.spTime, station.time, station.spRate) for station in network.stations] != stations:
+            raise ValueError('common spawns need networks with the same stations')
+    schedule = SpawnSchedule(networks[0], seed, chunk)
+    for network in networks:
+        network.spawns = schedule.copy()
+    return schedule
@@ -1,7 +1,13 @@
 import numpy as np
 import matplotlib.pyplot as plt
 import random as rnd
-from PriorityQueue import PriorityQueue
+from copy import copy
+from collections import deque
+from PriorityQueue import PriorityQueue, BucketQueue, bucketQueue, DaryHeap, daryHeap
+from CSRGraph import CSRGraph
+from CCH import CCH
+from scipy.sparse import csr_matrix
+from scipy.sparse.csgraph import dijkstra as csgraphDijkstra
 
 
 
@@ -18,13 +24,15 @@ def computepaths(station, network):
     n = len(network.stations)
     p = len(network.lines)
 
-    spanningForest = [None for _ in range(n * p)]
-    dejaVu = [False for _ in range(n * p)]
-    U = PriorityQueue(len(G))
+    spanningForest = [None for _ in range(len(G))]
+    durations = np.full(len(G), float('inf'))
+    dejaVu = [False for _ in range(len(G))]
+    U = network.queue(len(G))
     closer = [None for _ in network.shapes]
 
     for i in range(p):
         U.push(start + n * i, 0)
+        durations[start + n * i] = 0
     
     while U.length() != 0 and len([x for x in closer if x is None]) != 0:
         
@@ -34,52 +42,298 @@ def computepaths(station, network):
         else:
             
             for i in range(len(network.shapes)):
-                if closer[i] is None and network.stations[u % n].shape == network.shapes[i]:
+                if closer[i] is None and u < n * p and network.stations[u % n].shape == network.shapes[i]:
                     closer[i] = u
             dejaVu[u] = True
-            for (v, w) in G[u]:
-                
-                if - U.priority(v) > - k + w:
-                    
-                    U.changePrio(v, k - w)
-                    spanningForest[v] = u
+            G.relax(U, u, k, durations, spanningForest)
     
     for i in range(len(network.shapes)):
         route = []
         goal = closer[i]
         if not goal is None:
             station.durations[i] = - U.priority(goal)
-        while goal is not None and goal % n != station.idt and len(route) < n:
-            route.append((goal // n, goal % n))
+        while goal is not None and len(route) < n:
+            if goal < n * p:
+                if goal % n == station.idt:
+                    break
+                route.append((goal // n, goal % n))
             goal = spanningForest[goal]
         paths.append(route)
 
     return paths
 
 
+def shapeTargets(network, shapeNb):
+    shapes = np.tile([station.shape for station in network.stations], len(network.lines))
+    return np.flatnonzero(shapes == network.shapes[shapeNb])
+
+
+def shapeTree(network, shapeNb, R):
+
+    '''Runs one reverse search over the graph R (the reversed network graph) seeded from every (line, station) vertex of every station of the given shape. Returns the duration of the shortest trip from each vertex to the nearest station of that shape, and the vertex that follows each vertex on that trip (-1 if none).'''
+
+    targets = shapeTargets(network, shapeNb)
+    durations = np.full(len(R), float('inf'))
+    durations[targets] = 0
+    nextVertex = np.full(len(R), -1, dtype=np.int64)
+    U = network.queue(len(R))
+
+    for u in targets[R.indptr[targets + 1] > R.indptr[targets]].tolist():
+        U.push(u, 0)
+
+    while U.length() != 0:
+
+        (u, k) = U.pop()
+        R.relax(U, u, k, durations, nextVertex)
+        network.pathWork['settled'] += 1
+
+    network.pathWork['searches'] += 1
+    return durations, nextVertex
+
+
+def repairTree(network, shapeNb, tree, before, G, R, changed):
+
+    '''Repairs the tree of a shape computed on the graph before, now that the rows given by changed are different in the graph G. Only the vertices whose trip used an edge that got removed or slower are reset, with every vertex whose trip goes through them. Then a search seeded from their untouched neighbours and from the new edges that are shorter settles every vertex whose duration changes. It gives the same durations as shapeTree on G.'''
+
+    durations = tree[0].copy()
+    nextVertex = tree[1].copy()
+    target = np.zeros(len(G), dtype=bool)
+    target[shapeTargets(network, shapeNb)] = True
+    reached = np.isfinite(durations).sum()
+
+    affected = np.zeros(len(G), dtype=bool)
+    for u in np.flatnonzero(changed & ~target & (nextVertex >= 0)).tolist():
+        v = nextVertex[u]
+        old = before.weights[before.indptr[u]:before.indptr[u + 1]][before.indices[before.indptr[u]:before.indptr[u + 1]] == v]
+        new = G.weights[G.indptr[u]:G.indptr[u + 1]][G.indices[G.indptr[u]:G.indptr[u + 1]] == v]
+        if len(new) == 0 or new.min() > old.min():
+            affected[u] = True
+
+    while True:
+        spread = ~affected & (nextVertex >= 0)
+        spread[spread] = affected[nextVertex[spread]]
+        if not spread.any():
+            break
+        affected |= spread
+
+    durations[affected] = float('inf')
+    nextVertex[affected] = -1
+
+    tails = G.tails()
+    seeds = (affected | changed)[tails] & np.isfinite(durations[G.indices])
+    (T, V) = (tails[seeds], G.indices[seeds])
+    D = G.weights[seeds] + durations[V]
+    order = np.lexsort((D, T))
+    (T, V, D) = (T[order], V[order], D[order])
+    first = np.concatenate(([True], T[1:] != T[:-1]))[:len(T)]
+    better = D[first] < durations[T[first]]
+    U = network.queue(len(G))
+
+    for (u, v, d) in zip(T[first][better].tolist(), V[first][better].tolist(), D[first][better].tolist()):
+        U.changePrio(u, - d)
+        durations[u] = - U.priority(u)
+        nextVertex[u] = v
+
+    settled = 0
+    while U.length() != 0:
+
+        (u, k) = U.pop()
+        R.relax(U, u, k, durations, nextVertex)
+        settled += 1
+
+    network.pathWork['repairs'] += 1
+    network.pathWork['settled'] += settled
+    network.pathWork['skipped'] += max(0, int(reached) - settled)
+    return durations, nextVertex
+
+
+def scipyTrees(network):
+
+    '''Computes the trees of all the shapes with a single call to SciPy's Dijkstra. The reversed graph gets one extra source per shape, linked to every vertex of the stations of that shape, and the matrix of predecessors in these searches gives the vertex that follows each vertex on its trip.'''
+
+    R = network.graph.reverse()
+    N = len(R)
+    k = len(network.shapes)
+    targets = [shapeTargets(network, i) for i in range(k)]
+    tails = np.concatenate([R.tails()] + [np.full(len(targets[i]), N + i) for i in range(k)])
+    heads = np.concatenate([R.indices] + targets)
+    weights = np.concatenate([R.weights] + [np.zeros(len(t)) for t in targets])
+    graph = csr_matrix((weights, (tails, heads)), shape=(N + k, N + k))
+    (durations, predecessors) = csgraphDijkstra(graph, directed=True, indices=np.arange(N, N + k), return_predecessors=True)
+    network.pathWork['searches'] += k
+    network.pathWork['settled'] += int(np.isfinite(durations[:, :N]).sum())
+
+    trees = []
+    for i in range(k):
+        nextVertex = predecessors[i, :N].astype(np.int64)
+        nextVertex[(nextVertex < 0) | (nextVertex >= N)] = -1
+        trees.append((durations[i, :N], nextVertex))
+    return trees
+
+
+def hierarchyTrees(network):
+
+    '''Computes the trees of all the shapes with the contraction hierarchy of the network, which is only built again when the edges of the graph change, and otherwise just customized with the new weights.'''
+
+    if network.hierarchy is None or not network.hierarchy.sameTopology(network.graph):
+        network.hierarchy = CCH(network.graph)
+    network.hierarchy.customize(network.graph.weights)
+    network.pathWork['searches'] += len(network.shapes)
+    return [network.hierarchy.shapeTree(network.graph, shapeTargets(network, i)) for i in range(len(network.shapes))]
+
+
+def fillPaths(network, trees):
+    n = len(network.stations)
+    p = len(network.lines)
+    network.table = PathTable(network, trees)
+
+    for station in network.stations:
+        station.table = network.table
+        station.paths = None
+        station.durations = []
+        for i in range(len(network.shapes)):
+            if network.shapes[i] == station.shape:
+                station.durations.append(0)
+            elif p == 0:
+                station.durations.append(float('inf'))
+            else:
+                station.durations.append(network.table.durations[i][station.idt])
+
+
+def computeAllPaths(network):
+
+    '''Fills the paths and durations of every station with |shapes| searches, one per shape, instead of one search per station. The paths are the same piles of tuples (line number, goal) as the ones given by computepaths.'''
+
+    if network.backend == 'scipy':
+        trees = scipyTrees(network)
+    elif network.backend == 'cch':
+        trees = hierarchyTrees(network)
+    else:
+        R = network.graph.reverse()
+        trees = [shapeTree(network, i, R) for i in range(len(network.shapes))]
+    fillPaths(network, trees)
+    return trees
+
+
+def repairAllPaths(network, trees, before):
+
+    '''Same as computeAllPaths, but only repairs the trees computed on the graph before (with the same vertices as network.graph) around the vertices whose edges changed.'''
+
+    G = network.graph
+    changed = G.changedRows(before)
+    if changed.any():
+        R = G.reverse()
+        trees = [repairTree(network, i, trees[i], before, G, R, changed) for i in range(len(network.shapes))]
+    else:
+        network.pathWork['skipped'] += sum([int(np.isfinite(durations).sum()) for (durations, _) in trees])
+    fillPaths(network, trees)
+    return trees
+
+
+
+class PathTable:
+
+    '''A PathTable object holds the paths of every station to every shape, shared by all the passengers: hops[i][v] is the stop after the stop v on the way to the shape i (-1 at the end) and starts[i][s] the first stop from the station s. A table is never modified, so after updateAllPaths the passengers on their way keep following the old one.'''
+
+    def __init__(self, network, trees):
+        n = len(network.stations)
+        p = len(network.lines)
+        self.n = n
+        self.hops = []
+        self.stops = []
+        self.starts = []
+        self.durations = []
+        self.routes = {}
+
+        for i in range(len(network.shapes)):
+            (durations, nextVertex) = trees[i]
+            N = len(nextVertex)
+            jump = np.append(np.where(nextVertex == -1, N, nextVertex), N)
+            isStop = np.arange(N + 1) < n * p
+            isStop[N] = True
+            pending = np.flatnonzero(~isStop[jump])
+            while len(pending) != 0:
+                jump[pending] = jump[jump[pending]]
+                pending = pending[~isStop[jump[pending]]]
+
+            hop = jump.copy()
+            stations = np.arange(N + 1) % n if n != 0 else np.zeros(N + 1, dtype=np.int64)
+            same = np.flatnonzero((hop[:n * p] != N) & (stations[hop[:n * p]] == stations[:n * p]))
+            while len(same) != 0:
+                hop[same] = hop[hop[same]]
+                same = same[(hop[same] != N) & (stations[hop[same]] == stations[same])]
+            hop = hop[:n * p]
+            hop[hop == N] = -1
+            self.hops.append(hop)
+            self.stops.append([None if v == -1 else (v // n, v % n) for v in hop.tolist()])
+
+            layers = np.asarray(durations[:n * p]).reshape(p, n)
+            best = layers.argmin(axis=0) if p != 0 else np.zeros(n, dtype=np.int64)
+            minimum = layers.min(axis=0) if p != 0 else np.full(n, float('inf'))
+            start = np.where(np.isfinite(minimum), np.arange(n) + n * best, -1)
+            start[[s.idt for s in network.stations if s.shape == network.shapes[i]]] = -1
+            self.starts.append(start)
+            self.durations.append(minimum)
+
+    def stop(self, shapeNb, cursor):
+        if cursor == -1:
+            return None
+        return self.stops[shapeNb][cursor]
+
+    def route(self, shapeNb, cursor):
+        route = []
+        while cursor != -1 and len(route) < len(self.hops[shapeNb]):
+            if self.stops[shapeNb][cursor] is not None:
+                route.append(self.stops[shapeNb][cursor])
+            cursor = self.hops[shapeNb][cursor]
+        route.reverse()
+        return route
+
+    def paths(self, idt):
+        if not idt in self.routes:
+            self.routes[idt] = [self.route(i, self.starts[i][idt]) for i in range(len(self.hops))]
+        return self.routes[idt]
+
+
 
 class Passenger:
 
-    '''A Passenger object represents an user of the metro network. It is described by the shape number of its destination and the route that it is planning to use. The route is given by a pile of tuples (line number, goal). '''
+    '''A Passenger object represents an user of the metro network. It is described by the shape number of its destination and where it is on its path: a PathTable and a cursor, the last stop it reached in that table. The route, the pile of tuples (line number, goal) that it still has to follow, is only built on demand.'''
+
+    __slots__ = ['shape', 'shapeNb', 'table', 'cursor']
 
-    def __init__(self, shape, shapeNb, route=[]):
+    def __init__(self, shape, shapeNb, table=None, cursor=-1):
         self.shape = shape
         self.shapeNb = shapeNb
-        self.route = route
-    
-    def computeRoute(self, station):
-        self.route = station.paths[self.shapeNb].copy()
+        self.table = table
+        self.cursor = cursor
 
-        
+    def computeRoute(self, station):
+        self.table = station.table
+        self.cursor = -1 if station.table is None else int(station.table.starts[self.shapeNb][station.idt])
 
+    def nextStop(self):
+        if self.table is None:
+            return None
+        return self.table.stop(self.shapeNb, self.cursor)
 
+    def alight(self):
+        (line, goal) = self.nextStop()
+        self.cursor = goal + self.table.n * line
 
+    @property
+    def route(self):
+        if self.table is None:
+            return []
+        return self.table.route(self.shapeNb, self.cursor)
 
 
 
 class Station:
 
-    '''A Station object represents a metro station. It is defined by its id, its shape, its capacity, its spawn rate of passengers, the lines that go through this station and the passengers currently waiting at the station. sp gives the different rates of spawning of shapes. The variable time increases 1 at a time to spTime and then returns to 0, and a random passenger is created then. If there are more passengers waiting than the capacity allowed, the variable overloadtime increases, and decreases to 0 otherwise.'''
+    '''A Station object represents a metro station. It is defined by its id, its shape, its capacity, its spawn rate of passengers, the lines that go through this station and the passengers currently waiting at the station. sp gives the different rates of spawning of shapes. The variable time increases 1 at a time to spTime and then returns to 0, and a random passenger is created then. If there are more passengers waiting than the capacity allowed, the variable overloadtime increases, and decreases to 0 otherwise. The waiting passengers are kept in one FIFO queue per line, added with enqueue and read as a tuple through waiting.'''
+
+    __slots__ = ['idt', 'loc', 'shape', 'queues', 'nbWaiting', 'time', 'spRate', 'spTime', 'capacity', 'overloadTime', 'lines', 'transported', 'table', 'ownPaths', 'durations']
 
     def __init__(self, idt, shape, waiting, lines, spRate, loc=None, spTime=100, capacity=8):
         self.idt = idt
@@ -93,16 +347,59 @@ class Station:
         self.overloadTime = 0
         self.lines = lines
         self.transported = 0
-        self.paths = []
+        self.table = None
+        self.ownPaths = None
         self.durations = []
+
+    @property
+    def waiting(self):
+        return tuple([passenger for queue in self.queues.values() for passenger in queue])
+
+    @waiting.setter
+    def waiting(self, passengers):
+        self.queues = {}
+        self.nbWaiting = 0
+        for passenger in passengers:
+            self.enqueue(passenger)
+
+    def enqueue(self, passenger):
+        stop = passenger.nextStop()
+        line = None if stop is None else stop[0]
+        if not line in self.queues:
+            self.queues[line] = deque()
+        self.queues[line].append(passenger)
+        self.nbWaiting += 1
+
+    def board(self, line, places):
+        queue = self.queues.get(line)
+        boarding = []
+        while queue and len(boarding) < places:
+            boarding.append(queue.popleft())
+        self.nbWaiting -= len(boarding)
+        return boarding
+
+    @property
+    def paths(self):
+        if self.ownPaths is not None:
+            return self.ownPaths
+        if self.table is None:
+            return []
+        return self.table.paths(self.idt)
+
+    @paths.setter
+    def paths(self, paths):
+        self.ownPaths = paths
     
     def updatePaths(self, network):
+
+        '''Replaces the paths of this station by the ones of computepaths. The passengers that spawn here still follow the PathTable of the network.'''
+
         self.paths = computepaths(self, network)
     
     def upCrowded(self, network):
         if self.overloadTime >= 100:
             network.end = True
-        elif self.capacity < len(self.waiting):
+        elif self.capacity < self.nbWaiting:
             self.overloadTime += 1
         elif self.overloadTime > 0:
             self.overloadTime -= 1
@@ -111,14 +408,21 @@ class Station:
         self.transported += 1
     
     def spawn(self, network):
-        if self.time == self.spTime:
+        if self.time == self.spTime and network.spawns is not None:
+            i = network.spawns.draw(self.idt)
+            if i != -1:
+                passenger = Passenger(self.spRate[i][0], i)
+                passenger.computeRoute(self)
+                self.enqueue(passenger)
+            self.time = 0
+        elif self.time == self.spTime:
             r = rnd.random()
             for i in range(len(self.spRate)):
                 (shape, ratio) = self.spRate[i]
                 if r < ratio:
                     passenger = Passenger(shape, i)
                     passenger.computeRoute(self)
-                    self.waiting.append(passenger)
+                    self.enqueue(passenger)
                     break
                 elif r >= ratio:
                     r -= ratio
@@ -130,24 +434,60 @@ class Station:
 
 class Network:
 
-    '''A Map object is a graph representing a metro network. It is given by the list of its vertex, that are the stations, an array of the times it costs to travel between any pair of stations (integer) and the metro lines currently working.'''
+    '''A Map object is a graph representing a metro network. It is given by the list of its vertex, that are the stations, an array of the times it costs to travel between any pair of stations (integer) and the metro lines currently working. queue, graphModel, incremental and backend choose how updateAllPaths finds the paths, engine how oneEternityLater runs the ticks (see FastSim), and spawns, profiler and recorder take a SpawnSchedule, a TickProfiler and a TraceRecorder.'''
 
-    def __init__(self, stations, distances, lines, shapes):
+    def __init__(self, stations, distances, lines, shapes, queue=PriorityQueue, graphModel='full', incremental=False, backend='python', engine='objects'):
         self.shapes = shapes
+        self.backend = backend
+        self.engine = engine
+        self.table = None
+        self.spawns = None
+        self.profiler = None
+        self.recorder = None
+        self.hierarchy = None
+        self.queue = queue
+        self.graphModel = graphModel
+        self.incremental = incremental
+        self.trees = None
+        self.treesGraph = None
+        self.treesKey = None
+        self.pathWork = {'searches': 0, 'repairs': 0, 'settled': 0, 'skipped': 0}
         self.stations = stations
         self.distances = distances
         self.lines = lines
         self.end = False
+        self.tick = 0
         self.graph = self.createGraph()
 
     def nextState(self):
-        for station in self.stations:
-            station.spawn(self)
-            station.upCrowded(self)
-        for line in self.lines:
-            line.nextState(self.distances, self.stations)
+        self.tick += 1
+        if self.profiler is not None:
+            self.profiler.nextState(self)
+        else:
+            for station in self.stations:
+                station.spawn(self)
+                station.upCrowded(self)
+            for line in self.lines:
+                line.nextState(self.distances, self.stations)
+        if self.recorder is not None:
+            self.recorder.record(self)
+
+    def simulation(self):
+        from FastSim import ArraySimulation, EventSimulation, CountSimulation
+        if self.engine == 'events' and (self.recorder is not None or EventSimulation.density(self) > EventSimulation.dense):
+            return ArraySimulation(self)
+        return {'arrays': ArraySimulation, 'events': EventSimulation, 'counts': CountSimulation}[self.engine](self)
     
     def oneEternityLater(self, n):
+        if self.engine in ['arrays', 'events', 'counts']:
+            if self.profiler is not None:
+                return self.profiler.oneEternityLater(self, n)
+            simulation = self.simulation()
+            simulation.run(n)
+            simulation.store()
+            self.tick += simulation.tick
+            return self.end
+
         while n > 0 and not self.end:
             self.nextState()
             n -= 1
@@ -155,52 +495,107 @@ class Network:
         return self.end
     
     def createGraph(self):
-        G = [[] for _ in self.lines for _ in self.stations]
+        if self.graphModel == 'compact':
+            graph = self.createCompactGraph()
+        else:
+            graph = self.createFullGraph()
+        if hasattr(self.queue, 'resolution'):
+            return graph.rounded(self.queue.resolution)
+        return graph
+
+    def createFullGraph(self):
         n = len(self.stations)
+        tails = [np.zeros(0, dtype=np.int64)]
+        heads = [np.zeros(0, dtype=np.int64)]
+        weights = [np.zeros(0)]
 
         for line in self.lines:
-            for k in range(len(line.route)):
-                s = self.stations[line.route[k]]
-                d = 0
-                for l in range(1, len(line.route)):
-                    t = self.stations[line.route[(k + l - 1) % len(line.route)]]
-                    u = self.stations[line.route[(k + l) % len(line.route)]]
-                    d += self.distances[t.idt][u.idt]
-                    G[s.idt + n * line.nb].append((u.idt + n * line.nb, d))
-        
-        for s in self.stations:
-            for line1 in s.lines:
-                for line2 in s.lines:
-                    if line1 != line2:
-                        G[s.idt + n * line1].append((s.idt + n * line2, self.lines[line2].waitingTime(self)))
+            route = np.array(line.route, dtype=np.int64)
+            m = len(route)
+            metrics = line.metrics(self.distances)
+            prefix = np.concatenate((metrics.prefix, metrics.prefix[1:] + metrics.cycleLength))
+            (K, L) = np.meshgrid(np.arange(m), np.arange(1, m), indexing='ij')
+            tails.append(route[K].ravel() + n * line.nb)
+            heads.append(route[(K + L) % m].ravel() + n * line.nb)
+            weights.append((prefix[K + L] - prefix[K]).ravel())
+
+        waiting = [line.waitingTime(self) for line in self.lines]
+        transfers = [(s.idt + n * line1, s.idt + n * line2, waiting[line2]) for s in self.stations for line1 in s.lines for line2 in s.lines if line1 != line2]
+        if len(transfers) != 0:
+            (T, H, W) = zip(*transfers)
+            tails.append(np.array(T, dtype=np.int64))
+            heads.append(np.array(H, dtype=np.int64))
+            weights.append(np.array(W, dtype=np.float64))
 
-        return G
+        return CSRGraph.fromEdges(n * len(self.lines), np.concatenate(tails), np.concatenate(heads), np.concatenate(weights))
+
+    def createCompactGraph(self):
+
+        '''The vertex s + n * l is the station s on the line l, as in the full graph. Then come one transfer vertex per station and one vertex per stop of each line, for a passenger staying on board. Riding only goes from a stop to the next one, and changing lines goes through the transfer vertex of the station.'''
+
+        n = len(self.stations)
+        p = len(self.lines)
+        tails = [np.zeros(0, dtype=np.int64)]
+        heads = [np.zeros(0, dtype=np.int64)]
+        weights = [np.zeros(0)]
+        onboard = n * p + n
+
+        for line in self.lines:
+            route = np.array(line.route, dtype=np.int64)
+            m = len(route)
+            stops = route + n * line.nb
+            rides = onboard + np.arange(m)
+            tails += [stops, rides, rides]
+            heads += [rides, onboard + (np.arange(m) + 1) % m, stops]
+            weights += [np.zeros(m), np.diff(line.metrics(self.distances).prefix), np.zeros(m)]
+            onboard += m
+
+        waiting = [line.waitingTime(self) for line in self.lines]
+        transfers = [(s.idt + n * l, n * p + s.idt, waiting[l]) for s in self.stations for l in s.lines if len(s.lines) > 1]
+        if len(transfers) != 0:
+            (stops, hubs, W) = zip(*transfers)
+            tails += [np.array(stops, dtype=np.int64), np.array(hubs, dtype=np.int64)]
+            heads += [np.array(hubs, dtype=np.int64), np.array(stops, dtype=np.int64)]
+            weights += [np.zeros(len(W)), np.array(W, dtype=np.float64)]
+
+        return CSRGraph.fromEdges(onboard, np.concatenate(tails), np.concatenate(heads), np.concatenate(weights))
     
     def updateAllPaths(self):
         for station in self.stations:
             station.lines = [line.nb for line in self.lines if station.idt in line.route]
-        self.graph = self.createGraph()
-        for station in self.stations:
-            station.updatePaths(self)
+        graph = self.createGraph()
+        before = self.treesGraph
+        self.graph = graph
+        key = (len(graph), len(self.stations), len(self.lines))
+        if self.incremental and self.trees is not None and key == self.treesKey:
+            self.trees = repairAllPaths(self, self.trees, before)
+        else:
+            self.trees = computeAllPaths(self)
+        self.treesGraph = graph
+        self.treesKey = key
     
-    def plot(self, show=True):
+    def plot(self, show=True, axes=None):
 
         shapeList = ["s", "^", "o", "p", "P", "*", "d"]
+        if axes is None:
+            axes = plt.gca()
 
+        colors = []
         for line in self.lines:
             X = [self.stations[i].loc[0] for i in line.route]
             Y = [self.stations[i].loc[1] for i in line.route]
             X.append(X[0])
             Y.append(Y[0])
-            plt.plot(X, Y, linewidth=2)
+            colors.append(axes.plot(X, Y, linewidth=2)[0].get_color())
         
         for station in self.stations:
             (x,y) = station.loc
-            plt.scatter(x, y, s=64, c='black', marker=shapeList[station.shape])
+            axes.scatter(x, y, s=64, c='black', marker=shapeList[station.shape])
         
-        plt.axis('equal')
+        axes.axis('equal')
         if show:
             plt.show()
+        return colors
     
     def addLine(self, line):
         self.lines.append(line)
@@ -213,43 +608,252 @@ class Network:
     def addTrain(self, train):
         self.lines[train.line].trains.append(train)
 
+    def snapshot(self):
+        return NetworkSnapshot(self)
+
+    def restore(self, snapshot):
+        snapshot.restore(self)
+
+    def copy(self):
+
+        '''Returns a network that can be changed and simulated without touching this one, like deepcopy but much faster: the stations are built again around their location, shape and spawn rates, the lines, trains and passengers are built again from a snapshot, and everything that is never modified in place, like the distances, the graph, the trees and the PathTable, is shared.'''
+
+        network = copy(self)
+        network.stations = [Station(station.idt, station.shape, [], [], station.spRate, station.loc) for station in self.stations]
+        self.snapshot().restore(network)
+        return network
+
+
+
+class NetworkSnapshot:
+
+    '''A NetworkSnapshot object holds the mutable state of a network in flat arrays: the trains of the lines, the timers and counters of the stations, and the waiting and on-board passengers, cut into one slice per queue and per train. What is never modified in place is only referenced. restore puts this state back into a network with the same stations, any number of times.'''
+
+    def __init__(self, network):
+        stations = network.stations
+        lines = network.lines
+        trains = [train for line in lines for train in line.trains]
+        self.nbStations = len(stations)
+        self.routes = np.array([s for line in lines for s in line.route], dtype=np.int64)
+        self.routeBounds = np.cumsum([0] + [len(line.route) for line in lines])
+        self.cyclic = np.array([line.cyclic for line in lines], dtype=bool)
+        self.trainBounds = np.cumsum([0] + [len(line.trains) for line in lines])
+        self.trains = np.array([[train.nextDest, train.capacity, train.direct] for train in trains], dtype=np.int64).reshape(len(trains), 3)
+        self.nextTime = np.array([train.nextTime for train in trains], dtype=np.float64)
+
+        self.stations = np.array([[station.time, station.overloadTime, station.transported] for station in stations], dtype=np.int64).reshape(len(stations), 3)
+        self.capacity = [station.capacity for station in stations]
+        self.spTime = [station.spTime for station in stations]
+        self.stationLines = [list(station.lines) for station in stations]
+        self.durations = [list(station.durations) for station in stations]
+        self.ownPaths = [station.ownPaths for station in stations]
+        self.stationTables = [station.table for station in stations]
+
+        queues = [list(station.queues.items()) for station in stations]
+        holders = [queue for items in queues for (_, queue) in items] + [train.passengers for train in trains]
+        passengers = [passenger for holder in holders for passenger in holder]
+        self.queueLines = [line for items in queues for (line, _) in items]
+        self.queueBounds = np.cumsum([0] + [len(items) for items in queues])
+        self.passengerBounds = np.cumsum([0] + [len(holder) for holder in holders])
+        self.tables = [passenger.table for passenger in passengers]
+        self.shapes = [passenger.shape for passenger in passengers]
+        self.shapeNb = np.array([passenger.shapeNb for passenger in passengers], dtype=np.int64)
+        self.cursor = np.array([passenger.cursor for passenger in passengers], dtype=np.int64)
+
+        self.shared = {name: getattr(network, name) for name in ('table', 'graph', 'trees', 'treesGraph', 'treesKey', 'hierarchy', 'end', 'tick')}
+        self.pathWork = dict(network.pathWork)
+        self.spawns = None if network.spawns is None else network.spawns.copy()
+
+    def restore(self, network):
+        if len(network.stations) != self.nbStations:
+            raise ValueError('the snapshot was taken on a network with ' + str(self.nbStations) + ' stations')
+        passengers = [Passenger(shape, shapeNb, table, cursor) for (shape, shapeNb, table, cursor) in zip(self.shapes, self.shapeNb.tolist(), self.tables, self.cursor.tolist())]
+        (bounds, queueBounds) = (self.passengerBounds.tolist(), self.queueBounds.tolist())
+
+        (time, overloadTime, transported) = self.stations.T.tolist()
+        for (s, station) in enumerate(network.stations):
+            station.time = time[s]
+            station.overloadTime = overloadTime[s]
+            station.transported = transported[s]
+            station.capacity = self.capacity[s]
+            station.spTime = self.spTime[s]
+            station.lines = list(self.stationLines[s])
+            station.durations = list(self.durations[s])
+            station.ownPaths = self.ownPaths[s]
+            station.table = self.stationTables[s]
+            station.queues = {self.queueLines[q]: deque(passengers[bounds[q]:bounds[q + 1]]) for q in range(queueBounds[s], queueBounds[s + 1])}
+            station.nbWaiting = bounds[queueBounds[s + 1]] - bounds[queueBounds[s]]
+
+        (nextDest, capacity, direct) = self.trains.T.tolist()
+        nextTime = self.nextTime.tolist()
+        (routes, routeBounds, trainBounds) = (self.routes.tolist(), self.routeBounds.tolist(), self.trainBounds.tolist())
+        network.lines = []
+        for l in range(len(self.cyclic)):
+            trains = []
+            for t in range(trainBounds[l], trainBounds[l + 1]):
+                q = queueBounds[-1] + t
+                onboard = passengers[bounds[q]:bounds[q + 1]]
+                trains.append(Train(l, nextDest[t], nextTime[t], onboard, capacity[t], bool(direct[t])))
+            network.lines.append(Line(l, routes[routeBounds[l]:routeBounds[l + 1]], trains, bool(self.cyclic[l])))
+
+        for (name, value) in self.shared.items():
+            setattr(network, name, value)
+        network.pathWork = dict(self.pathWork)
+        network.spawns = None if self.spawns is None else self.spawns.copy()
+
+
+
+
+
+
+
+class WatchedList(list):
 
+    '''A WatchedList is a list that tells its owner each time it is modified, through owner.invalidate().'''
 
+    __slots__ = ['owner']
 
+    def __init__(self, items, owner):
+        super().__init__(items)
+        self.owner = owner
+
+    def __reduce_ex__(self, protocol):
+        return (WatchedList, (list(self), self.owner))
+
+    def __setitem__(self, i, x):
+        super().__setitem__(i, x)
+        self.owner.invalidate()
+
+    def __delitem__(self, i):
+        super().__delitem__(i)
+        self.owner.invalidate()
+
+    def __iadd__(self, items):
+        super().__iadd__(items)
+        self.owner.invalidate()
+        return self
+
+    def __imul__(self, k):
+        super().__imul__(k)
+        self.owner.invalidate()
+        return self
+
+    def append(self, x):
+        super().append(x)
+        self.owner.invalidate()
+
+    def extend(self, items):
+        super().extend(items)
+        self.owner.invalidate()
+
+    def insert(self, i, x):
+        super().insert(i, x)
+        self.owner.invalidate()
+
+    def pop(self, i=-1):
+        x = super().pop(i)
+        self.owner.invalidate()
+        return x
+
+    def remove(self, x):
+        super().remove(x)
+        self.owner.invalidate()
+
+    def clear(self):
+        super().clear()
+        self.owner.invalidate()
+
+    def sort(self, **kwargs):
+        super().sort(**kwargs)
+        self.owner.invalidate()
+
+    def reverse(self):
+        super().reverse()
+        self.owner.invalidate()
+
+
+
+class LineMetrics:
+
+    '''A LineMetrics object holds what only depends on the route and the number of trains of a line: prefix[k] is the time to ride from route[0] to route[k], prefix[len(route)] is the length of the whole cycle, headway is the time between two trains and waitingTime the mean waiting time of a passenger at a station of the line.'''
+
+    __slots__ = ['prefix', 'cycleLength', 'headway', 'waitingTime', 'distances']
+
+    def __init__(self, line, distances):
+        route = line.route
+        self.distances = distances
+        legs = [distances[route[k]][route[(k + 1) % len(route)]] for k in range(len(route))]
+        self.prefix = np.concatenate(([0], np.cumsum(legs)))
+        self.cycleLength = self.prefix[-1]
+        self.headway = self.cycleLength / len(line.trains) if len(line.trains) != 0 else float('inf')
+        self.waitingTime = self.cycleLength / (1 + 2 * len(line.trains))
 
 
 
 class Line:
 
-    '''A Line object represents a metro line. It is defined by an unique number, the list of stations on this line (which can be cyclic) and the list of trains on this line. The direct parameter indicates if the train is following the route in the left -> right order or in the opposite order.'''
+    '''A Line object represents a metro line. It is defined by an unique number, the list of stations on this line (which can be cyclic) and the list of trains on this line. The direct parameter indicates if the train is following the route in the left -> right order or in the opposite order. The metrics of the line are cached until its route or its list of trains is modified.'''
+
+    __slots__ = ['nb', 'cache', '_route', '_trains', 'cyclic']
 
     def __init__(self, nb, route, trains, cyclic=True):
         self.nb = nb
+        self.cache = None
         self.route = route
         self.trains = trains
         self.cyclic = cyclic
+
+    @property
+    def route(self):
+        return self._route
+
+    @route.setter
+    def route(self, route):
+        self._route = WatchedList(route, self)
+        self.invalidate()
+
+    @property
+    def trains(self):
+        return self._trains
+
+    @trains.setter
+    def trains(self, trains):
+        self._trains = WatchedList(trains, self)
+        self.invalidate()
+
+    def invalidate(self):
+        self.cache = None
+
+    def metrics(self, distances):
+        if self.cache is None or self.cache.distances is not distances:
+            self.cache = LineMetrics(self, distances)
+        return self.cache
     
     def nextState(self, dist, stations):
         for train in self.trains:
             if train.nextTime != 0:
                 train.nextTime -= 1
             else:
-                station = stations[self.route[train.nextDest]]
-                if not self.cyclic and train.nextDest == len(self.route) - 1:
-                    train.direct = False
-                elif not self.cyclic and train.nextDest == 0:
-                    train.direct = True
-                if train.direct:
-                    train.nextDest = (train.nextDest + 1) % len(self.route)
-                else:
-                    train.nextDest = (train.nextDest - 1) % len(self.route)
-                nextStation = stations[self.route[train.nextDest]]
-                train.nextTime = dist[station.idt][nextStation.idt]
+                station = self.move(train, dist, stations)
                 train.empty(station)
                 train.fill(station)
+
+    def move(self, train, dist, stations):
+        station = stations[self.route[train.nextDest]]
+        if not self.cyclic and train.nextDest == len(self.route) - 1:
+            train.direct = False
+        elif not self.cyclic and train.nextDest == 0:
+            train.direct = True
+        if train.direct:
+            train.nextDest = (train.nextDest + 1) % len(self.route)
+        else:
+            train.nextDest = (train.nextDest - 1) % len(self.route)
+        nextStation = stations[self.route[train.nextDest]]
+        train.nextTime = dist[station.idt][nextStation.idt]
+        return station
     
     def waitingTime(self, network):
-        return sum([network.distances[self.route[k]][self.route[(k + 1) % len(self.route)]] for k in range(len(self.route))]) / (1 + 2 * len(self.trains))
+        return self.metrics(network.distances).waitingTime
 
 
 
@@ -259,6 +863,8 @@ class Train:
 
     '''A Train object represents a metro train. It is defined by the number of the line it is working on, its next destination, the time needed to go to the next destination, the list of passengers onboard and its capacity.'''
 
+    __slots__ = ['line', 'nextDest', 'nextTime', 'passengers', 'capacity', 'direct']
+
     def __init__(self, line, nextDest, nextTime, passengers, capacity, direct=True):
         self.line = line
         self.nextDest = nextDest
@@ -272,27 +878,19 @@ class Train:
         stillGoing = []
         while i < len(self.passengers):
             passenger = self.passengers[i]
+            stop = passenger.nextStop()
             if passenger.shape == station.shape:
                 station.count()
-            elif passenger.route[-1][1] == station.idt:
-                passenger.route.pop()
-                station.waiting.append(passenger)
+            elif stop is not None and stop[1] == station.idt:
+                passenger.alight()
+                station.enqueue(passenger)
             else:
                 stillGoing.append(passenger)
             i += 1
         self.passengers = stillGoing
     
     def fill(self, station):
-        i = 0
-        stillWaiting = []
-        while i < len(station.waiting) and self.capacity > len(self.passengers):
-            passenger = station.waiting[i]
-            if passenger.route[-1][0] == self.line:
-                self.passengers.append(passenger)
-            else:
-                stillWaiting.append(passenger)
-            i += 1
-        station.waiting = stillWaiting
+        self.passengers += station.board(self.line, self.capacity - len(self.passengers))
 
 
     
\ No newline at end of file
@@ -0,0 +1,245 @@
+import json
+import os
+import numpy as np
+
+
+
+class TraceRecorder:
+
+    '''A TraceRecorder object writes the state of a network after every tick, once it is set as network.recorder: waiting, overload and transported per station, nextDest, nextTime, direct and load per train, with tick and end. Every chunk ticks go into a keyframe of their first tick, column-k.npy, and deltas-k.npy, the (row, column, index, value) log of the stations and trains the next ticks touch; nextTime counts down between the arrivals it logs. meta.json describes the network and the columns, and Trace reads the directory back.'''
+
+    stationColumns = {'waiting': np.int32, 'overload': np.int16, 'transported': np.int32}
+    trainColumns = {'nextDest': np.int32, 'nextTime': np.float32, 'direct': np.bool_, 'load': np.int32}
+
+    def __init__(self, directory, network, chunk=4096):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.chunk = chunk
+        self.network = network
+        self.trains = [train for line in network.lines for train in line.trains]
+        self.routes = [list(line.route) for line in network.lines for _ in line.trains]
+        self.dtypes = dict(self.stationColumns, **self.trainColumns)
+        self.names = list(self.dtypes)
+        self.period = [station.spTime + 1 for station in network.stations]
+        self.source = None
+        self.tick = None
+        self.ticksRow = np.zeros(chunk, dtype=np.int64)
+        self.endRow = np.zeros(chunk, dtype=np.bool_)
+        self.keys = {}
+        self.deltas = []
+        self.row = 0
+        self.chunks = 0
+        self.ticks = 0
+        self.meta = {'stations': [{'loc': list(station.loc) if station.loc is not None else None, 'shape': station.shape, 'capacity': station.capacity} for station in network.stations],
+                     'lines': [{'route': list(line.route), 'cyclic': line.cyclic, 'legs': [float(network.distances[line.route[k]][line.route[(k + 1) % len(line.route)]]) for k in range(len(line.route))]} for line in network.lines],
+                     'trainLines': [l for (l, line) in enumerate(network.lines) for _ in line.trains],
+                     'columns': ['tick', 'end'] + self.names, 'dtypes': {name: np.dtype(dtype).str for (name, dtype) in self.dtypes.items()}, 'countdown': ['nextTime'], 'chunk': chunk}
+        self.writeMeta()
+
+    def state(self, source):
+        stations = self.network.stations
+        if source is self.network:
+            trains = [train for line in source.lines for train in line.trains]
+            columns = {'waiting': [station.nbWaiting for station in stations], 'overload': [station.overloadTime for station in stations], 'transported': [station.transported for station in stations],
+                       'nextDest': [train.nextDest for train in trains], 'nextTime': [train.nextTime for train in trains], 'direct': [train.direct for train in trains], 'load': [len(train.passengers) for train in trains]}
+        else:
+            columns = {'waiting': [source.waitingAt(s) for s in range(len(stations))], 'overload': source.overload, 'transported': source.transported,
+                       'nextDest': source.nextDest, 'nextTime': source.clock[len(stations):], 'direct': source.direct, 'load': [source.loadAt(t) for t in range(len(source.trains))]}
+        return {name: np.array(columns[name], dtype=self.dtypes[name]) for name in self.names}
+
+    def sync(self, source, tick):
+
+        '''Reads the whole state from source, the network or the simulation that runs it, after the tick tick. The next ticks only read the stations that spawn or where a train arrives, the overloaded stations and the trains that arrive.'''
+
+        self.source = source
+        self.tick = tick
+        stations = self.network.stations
+        if source is self.network:
+            self.calendar = {}
+            for (s, station) in enumerate(stations):
+                self.calendar.setdefault(tick + station.spTime - station.time + 1, []).append(s)
+            for (t, train) in enumerate(self.trains):
+                self.schedule(t, tick, train.nextTime)
+            self.overload = [station.overloadTime for station in stations]
+            self.hot = [s for s in range(len(stations)) if stations[s].overloadTime > 0 or stations[s].capacity < stations[s].nbWaiting]
+            self.isHot = [False for _ in stations]
+            for s in self.hot:
+                self.isHot[s] = True
+        else:
+            self.overload = np.array(source.overload, dtype=np.int64)
+            self.overloaded = bool(self.overload.any())
+        if self.row != 0:
+            state = self.state(source)
+            for (c, name) in enumerate(self.names):
+                for (i, value) in enumerate(state[name].tolist()):
+                    self.deltas += (self.row, c, i, value)
+
+    def schedule(self, t, tick, nextTime):
+        if nextTime >= 0 and nextTime == int(nextTime):
+            self.calendar.setdefault(tick + int(nextTime) + 1, []).append(len(self.period) + t)
+
+    def record(self, network):
+        trains = [train for line in network.lines for train in line.trains]
+        if len(trains) != len(self.trains):
+            raise ValueError('the trains of the network changed during the recording')
+        if self.source is not network or network.tick != self.tick + 1:
+            self.sync(network, network.tick)
+        else:
+            (stations, calendar, n, row, tick) = (network.stations, self.calendar, len(self.period), self.row, network.tick)
+            self.tick = tick
+            touched = []
+            for x in calendar.pop(tick, []):
+                if x < n:
+                    calendar.setdefault(tick + self.period[x], []).append(x)
+                    touched.append(x)
+                    continue
+                (t, train) = (x - n, trains[x - n])
+                route = self.routes[t]
+                s = route[(train.nextDest - 1) % len(route)] if train.direct else route[(train.nextDest + 1) % len(route)]
+                self.schedule(t, tick, train.nextTime)
+                self.deltas += (row, 3, t, train.nextDest, row, 4, t, train.nextTime, row, 5, t, train.direct, row, 6, t, len(train.passengers), row, 2, s, stations[s].transported)
+                touched.append(s)
+            for s in touched:
+                self.deltas += (row, 0, s, stations[s].nbWaiting)
+            (hot, isHot, overload) = (self.hot, self.isHot, self.overload)
+            for s in touched:
+                if not isHot[s]:
+                    isHot[s] = True
+                    hot.append(s)
+            self.hot = []
+            for s in hot:
+                station = stations[s]
+                if station.overloadTime != overload[s]:
+                    overload[s] = station.overloadTime
+                    self.deltas += (row, 1, s, station.overloadTime)
+                if station.overloadTime > 0 or station.capacity < station.nbWaiting:
+                    self.hot.append(s)
+                else:
+                    isHot[s] = False
+        self.write(network.tick, network.end)
+
+    def recordSimulation(self, simulation, tick):
+        if self.source is not simulation or tick != self.tick + 1:
+            self.sync(simulation, tick)
+        else:
+            (n, row, due) = (len(self.period), self.row, simulation.due)
+            self.tick = tick
+            touched = due[:simulation.spawned]
+            for t in due[simulation.spawned:]:
+                (t, s) = (t - n, simulation.lastStation(t - n))
+                self.deltas += (row, 3, t, simulation.nextDest[t], row, 4, t, float(simulation.clock[n + t]), row, 5, t, simulation.direct[t], row, 6, t, simulation.loadAt(t), row, 2, s, simulation.transported[s])
+                touched.append(s)
+            for s in touched:
+                self.deltas += (row, 0, s, simulation.waitingAt(s))
+            if self.overloaded or simulation.overload.any():
+                changed = np.flatnonzero(simulation.overload != self.overload)
+                self.overload[changed] = simulation.overload[changed]
+                self.overloaded = bool(self.overload.any())
+                for (s, value) in zip(changed.tolist(), simulation.overload[changed].tolist()):
+                    self.deltas += (row, 1, s, value)
+        self.write(tick, simulation.end)
+
+    def write(self, tick, end):
+
+        '''Writes the tick recorded: the first tick of a chunk as its keyframe, read again from the source, the others as the values logged since the last write.'''
+
+        row = self.row
+        if row == 0:
+            self.keys = self.state(self.source)
+            self.deltas = []
+        self.ticksRow[row] = tick
+        self.endRow[row] = end
+        self.row += 1
+        self.ticks += 1
+        if self.row == self.chunk:
+            self.flush()
+
+    def flush(self):
+        if self.row == 0:
+            return
+        path = lambda name: os.path.join(self.directory, name + '-' + str(self.chunks) + '.npy')
+        np.save(path('tick'), self.ticksRow[:self.row])
+        np.save(path('end'), self.endRow[:self.row])
+        for name in self.names:
+            np.save(path(name), self.keys[name])
+        np.save(path('deltas'), np.array(self.deltas, dtype=np.float64).reshape(-1, 4))
+        self.deltas = []
+        self.chunks += 1
+        self.row = 0
+        self.writeMeta()
+
+    def writeMeta(self):
+        self.meta['ticks'] = self.ticks
+        self.meta['chunks'] = self.chunks
+        with open(os.path.join(self.directory, 'meta.json'), 'w') as file:
+            json.dump(self.meta, file)
+
+    def close(self):
+        self.flush()
+        self.writeMeta()
+
+
+
+class Trace:
+
+    '''A Trace object reads a directory written by a TraceRecorder without loading it: the chunks are memory-mapped the first time they are needed. column(name) gives a whole column as one array, and frame(i) the values of every column at the i-th tick recorded, only reading the chunk that holds it: the keyframe of the chunk with the changes logged up to that tick.'''
+
+    def __init__(self, directory):
+        self.directory = directory
+        with open(os.path.join(directory, 'meta.json')) as file:
+            self.meta = json.load(file)
+        self.chunk = self.meta['chunk']
+        self.ticks = self.meta['ticks']
+        self.columns = self.meta['columns']
+        self.names = [name for name in self.columns if name not in ('tick', 'end')]
+        self.maps = {}
+
+    def __len__(self):
+        return self.ticks
+
+    def chunkOf(self, name, k):
+        if (name, k) not in self.maps:
+            self.maps[(name, k)] = np.load(os.path.join(self.directory, name + '-' + str(k) + '.npy'), mmap_mode='r')
+        return self.maps[(name, k)]
+
+    def changes(self, name, k):
+        deltas = self.chunkOf('deltas', k)
+        deltas = deltas[deltas[:, 1] == self.names.index(name)]
+        return deltas[:, 0].astype(np.int64), deltas[:, 2].astype(np.int64), deltas[:, 3]
+
+    def rows(self, name, k):
+        key = self.chunkOf(name, k)
+        if name in ('tick', 'end'):
+            return np.asarray(key)
+        (row, index, value) = self.changes(name, k)
+        last = np.full((len(self.chunkOf('tick', k)), len(key)), -1, dtype=np.int64)
+        last[row, index] = np.arange(len(row))
+        last = np.maximum.accumulate(last, axis=0)
+        values = np.where(last == -1, key[None, :], np.append(value, 0)[last])
+        if name in self.meta['countdown']:
+            values -= np.arange(len(last))[:, None] - np.where(last == -1, 0, np.append(row, 0)[last])
+        return values.astype(self.meta['dtypes'][name])
+
+    def column(self, name):
+        if self.meta['chunks'] == 0:
+            return np.zeros(0)
+        return np.concatenate([self.rows(name, k) for k in range(self.meta['chunks'])])
+
+    def frame(self, i):
+        if not 0 <= i < self.ticks:
+            raise IndexError('the trace has ' + str(self.ticks) + ' ticks')
+        (k, r) = divmod(i, self.chunk)
+        frame = {'tick': self.chunkOf('tick', k)[r], 'end': self.chunkOf('end', k)[r]}
+        deltas = self.chunkOf('deltas', k)
+        deltas = np.asarray(deltas[:np.searchsorted(deltas[:, 0], r, side='right')])
+        for (c, name) in enumerate(self.names):
+            (row, index, value) = (deltas[:, 0], deltas[:, 2].astype(np.int64), deltas[:, 3])
+            logged = deltas[:, 1] == c
+            values = np.array(self.chunkOf(name, k), dtype=np.float64)
+            values[index[logged]] = value[logged]
+            if name in self.meta['countdown']:
+                since = np.zeros(len(values))
+                since[index[logged]] = row[logged]
+                values -= r - since
+            frame[name] = values.astype(self.meta['dtypes'][name])
+        return frame